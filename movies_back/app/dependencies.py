@@ -1,45 +1,35 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
 from sqlalchemy.orm import Session
-from datetime import datetime
-import os
-from dotenv import load_dotenv
+from typing import Optional
 
 from .database import get_db
 from .models.user import User
-from .schemas.user import TokenData
-
-# 加载环境变量
-load_dotenv()
-
-# 从环境变量获取密钥
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
+from .utils.auth import load_principal
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/users/token")
+# 可选登录的接口使用，未携带令牌时不报错
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/users/token", auto_error=False)
 
-async def get_current_user(
+def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="无效的认证凭据",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
-        raise credentials_exception
-        
-    user = db.query(User).filter(User.username == token_data.username).first()
+    # 令牌对应的用户有缓存，重复请求不查询数据库
+    user = load_principal(token, db)
     if user is None:
-        raise credentials_exception
-        
-    return user 
\ No newline at end of file
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无效的认证凭据",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+def get_optional_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> Optional[User]:
+    """可选登录：未携带令牌或令牌无效时返回 None"""
+    if not token:
+        return None
+    return load_principal(token, db)
@@ -1,19 +1,62 @@
+from contextlib import asynccontextmanager
+from anyio import to_thread
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from .routers import users, movies, reviews, admin
-from .database import engine
-from .models import user, movie, review
+from .database import engine, THREADPOOL_SIZE
+from .models import user, movie, review, tag, country, activity, cache_invalidation, similarity, rating_stats, user_stats, review_term, revoked_token
+from .services.view_counter import view_counter
+from .services.sampler import movie_sampler
+from .services.search_index import search_index
+from .services.detail_cache import movie_detail_cache
+from .services.trending import trending
+from .services.similarity import similarity_index
+from .services.collaborative import item_cf
+from .services.suggest import suggest_index
+from .services.review_queue import review_queue
+from .services.password_hasher import password_hasher
+from .services.token_revocation import token_revocations
 from statistics.movie_analysis import get_analysis_data
 
 # 创建数据库表 - 添加 checkfirst=True 参数
 user.Base.metadata.create_all(bind=engine, checkfirst=True)
 movie.Base.metadata.create_all(bind=engine, checkfirst=True)
 review.MovieReview.__table__.create(bind=engine, checkfirst=True)
+cache_invalidation.CacheInvalidation.__table__.create(bind=engine, checkfirst=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 数据库访问均为同步调用，路由声明为普通函数后由线程池执行，不会阻塞事件循环
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    # 启动后台任务
+    view_counter.start()
+    movie_sampler.start()
+    search_index.start()
+    movie_detail_cache.start()
+    trending.start()
+    similarity_index.start()
+    item_cf.start()
+    suggest_index.start()
+    review_queue.start()
+    token_revocations.start()
+    yield
+    # 关闭时写回内存中的缓冲数据
+    await token_revocations.stop()
+    await review_queue.stop()
+    await suggest_index.stop()
+    await item_cf.stop()
+    await similarity_index.stop()
+    await trending.stop()
+    await movie_detail_cache.stop()
+    await movie_sampler.stop()
+    await view_counter.stop()
+    password_hasher.shutdown()
 
 app = FastAPI(
     title="电影数据可视化分析平台",
     description="基于FastAPI的电影数据可视化分析平台后端API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 配置CORS
@@ -38,7 +81,7 @@ app.include_router(reviews.router, prefix="/api/reviews", tags=["reviews"])
 app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
 @app.get("/api/statistics")
-async def get_statistics():
+def get_statistics():
     """获取电影统计数据"""
     try:
         data = get_analysis_data()
@@ -4,4 +4,13 @@
 
 from .user import User
 from .movie import Movie
-from .review import MovieReview 
\ No newline at end of file
+from .review import MovieReview
+from .tag import Tag, MovieTag
+from .country import Country, MovieCountry
+from .activity import MovieActivityHourly
+from .cache_invalidation import CacheInvalidation
+from .similarity import MovieSimilarity, MovieFeatureHash
+from .rating_stats import MovieRatingStats
+from .user_stats import UserReviewStats, UserReviewFacet
+from .review_term import ReviewTerm
+from .revoked_token import RevokedToken
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, Index
+from ..database import Base
+
+class MovieActivityHourly(Base):
+    """按小时聚合的电影浏览/评价次数，用于计算热度"""
+    __tablename__ = "movie_activity_hourly"
+    __table_args__ = (
+        Index("idx_activity_hour", "hour"),
+    )
+
+    movie_id = Column(Integer, primary_key=True)
+    hour = Column(Integer, primary_key=True)  # 自1970年起的小时数
+    views = Column(Integer, nullable=False, default=0)
+    reviews = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from ..database import Base
+
+class CacheInvalidation(Base):
+    """爬虫写入电影数据后记录一条失效通知，由应用进程轮询后清理缓存"""
+    __tablename__ = "cache_invalidations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    douban_id = Column(String(20), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
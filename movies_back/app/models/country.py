@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
+from ..database import Base
+
+class Country(Base):
+    __tablename__ = "countries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(50), unique=True, nullable=False, index=True)
+
+class MovieCountry(Base):
+    __tablename__ = "movie_countries"
+    __table_args__ = (
+        # 主键 (country_id, movie_id) 用于按国家查电影，另建索引用于按电影查国家
+        Index("idx_movie_countries_movie_id", "movie_id"),
+    )
+
+    country_id = Column(Integer, ForeignKey("countries.id"), primary_key=True)
+    movie_id = Column(Integer, ForeignKey("movies_top250.id"), primary_key=True)
@@ -1,8 +1,14 @@
-from sqlalchemy import Column, Integer, String, Float, Text
+from sqlalchemy import Column, Integer, String, Float, Double, Text, Index
 from app.database import Base
 
 class Movie(Base):
     __tablename__ = "movies_top250"
+    __table_args__ = (
+        # 按评分排序的游标分页及年份范围过滤使用
+        Index("idx_rating_id", "rating", "id"),
+        Index("idx_release_year_rating", "release_year", "rating"),
+        Index("idx_community_score_id", "community_score", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     douban_id = Column(String(20), index=True)
@@ -12,7 +18,9 @@ class Movie(Base):
     leader = Column(String(100))
     tags = Column(String(255))
     years = Column(String(10))
+    release_year = Column(Integer)  # 由years解析出的年份，用于范围查询
     country = Column(String(100))
     director_description = Column(String(100))
     cover_image = Column(String(500))
-    view_count = Column(Integer, default=0) 
\ No newline at end of file
+    view_count = Column(Integer, default=0)
+    community_score = Column(Double)  # 豆瓣评分与站内评分的贝叶斯加权，随评价增量更新 
\ No newline at end of file
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, Float
+from ..database import Base
+
+class MovieRatingStats(Base):
+    """每部电影的用户评分汇总，随评价的增删改在同一事务内增量更新"""
+    __tablename__ = "movie_rating_stats"
+
+    movie_id = Column(Integer, primary_key=True)
+    review_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Float, nullable=False, default=0)
+    # 1-5 星的评分分布
+    stars_1 = Column(Integer, nullable=False, default=0)
+    stars_2 = Column(Integer, nullable=False, default=0)
+    stars_3 = Column(Integer, nullable=False, default=0)
+    stars_4 = Column(Integer, nullable=False, default=0)
+    stars_5 = Column(Integer, nullable=False, default=0)
@@ -1,14 +1,23 @@
-from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, DateTime, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from ..database import Base
 
 class MovieReview(Base):
     __tablename__ = "movie_reviews"
+    __table_args__ = (
+        # 按电影分页读取评价，按 (created_at, id) 游标翻页
+        Index("idx_reviews_movie_created", "movie_id", "created_at"),
+        # 按用户分页读取评价历史
+        Index("idx_reviews_user_created", "user_id", "created_at"),
+        # 每个用户对每部电影只有一条评价，写入用 INSERT ... ON DUPLICATE KEY UPDATE
+        UniqueConstraint("user_id", "movie_id", name="uq_reviews_user_movie"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     movie_id = Column(Integer, ForeignKey("movies_top250.id"))
     rating = Column(Float, nullable=False)  # 评分 1-5
     content = Column(Text, nullable=True)   # 评论内容(可选)
+    prev_rating = Column(Float, nullable=True)  # 最近一次覆盖前的评分，新增时为空，用于增量更新评分汇总
     created_at = Column(DateTime(timezone=True), server_default=func.now()) 
\ No newline at end of file
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, Index
+from ..database import Base
+
+class ReviewTerm(Base):
+    """评价内容的倒排索引，每个 (词项, 评价) 一行；冗余电影、用户id以便按二者过滤时直接走索引"""
+    __tablename__ = "review_terms"
+    __table_args__ = (
+        Index("idx_review_terms_movie", "term", "movie_id", "review_id"),
+        Index("idx_review_terms_user", "term", "user_id", "review_id"),
+        # 评价修改、删除时按评价id清除旧词项
+        Index("idx_review_terms_review", "review_id"),
+    )
+
+    term = Column(String(32, collation="utf8mb4_bin"), primary_key=True)
+    review_id = Column(Integer, primary_key=True)
+    movie_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
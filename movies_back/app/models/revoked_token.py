@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from ..database import Base
+
+class RevokedToken(Base):
+    """已吊销的令牌，按 jti 记录；令牌过期后不再需要，定期清理"""
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True)  # 自增，各进程按 id 增量同步
+    jti = Column(String(32), nullable=False, unique=True)
+    expires_at = Column(DateTime, nullable=False, index=True)  # UTC，与令牌 exp 一致
+    revoked_at = Column(DateTime(timezone=True), server_default=func.now())
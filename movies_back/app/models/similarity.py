@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, Float, String, Index
+from ..database import Base
+
+class MovieSimilarity(Base):
+    """离线计算的相似电影，每部电影保存前 k 个邻居，按 (movie_id, seq) 顺序读取"""
+    __tablename__ = "movie_similarities"
+    __table_args__ = (
+        # 电影元数据变化时查找把它列为邻居的电影
+        Index("idx_similar_id", "similar_id"),
+    )
+
+    movie_id = Column(Integer, primary_key=True)
+    seq = Column(Integer, primary_key=True)  # 相似度排名，从0开始
+    similar_id = Column(Integer, nullable=False)
+    score = Column(Float, nullable=False)
+
+class MovieFeatureHash(Base):
+    """参与相似度计算的字段摘要，用于判断电影元数据是否变化"""
+    __tablename__ = "movie_feature_hashes"
+
+    movie_id = Column(Integer, primary_key=True)
+    feature_hash = Column(String(32), nullable=False)
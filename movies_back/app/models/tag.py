@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
+from ..database import Base
+
+class Tag(Base):
+    __tablename__ = "tags"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(50), unique=True, nullable=False, index=True)
+
+class MovieTag(Base):
+    __tablename__ = "movie_tags"
+    __table_args__ = (
+        # 主键 (tag_id, movie_id) 用于按标签查电影，另建索引用于按电影查标签
+        Index("idx_movie_tags_movie_id", "movie_id"),
+    )
+
+    tag_id = Column(Integer, ForeignKey("tags.id"), primary_key=True)
+    movie_id = Column(Integer, ForeignKey("movies_top250.id"), primary_key=True)
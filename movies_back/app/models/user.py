@@ -14,4 +14,5 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     avatar = Column(String(200), nullable=True)
-    bio = Column(String(500), nullable=True) 
\ No newline at end of file
+    bio = Column(String(500), nullable=True)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")  # 修改密码时递增，使已签发的令牌失效 
\ No newline at end of file
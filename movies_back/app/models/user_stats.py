@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, Float, String
+from ..database import Base
+
+class UserReviewStats(Base):
+    """每个用户的评价数量与评分总和，随评价的增删改在同一事务内增量更新"""
+    __tablename__ = "user_review_stats"
+
+    user_id = Column(Integer, primary_key=True)
+    review_count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Float, nullable=False, default=0)
+
+class UserReviewFacet(Base):
+    """用户评价过的电影按标签、国家、年份的计数"""
+    __tablename__ = "user_review_facets"
+
+    user_id = Column(Integer, primary_key=True)
+    facet = Column(String(16), primary_key=True)  # tag/country/year
+    value = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
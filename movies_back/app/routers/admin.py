@@ -1,15 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio
+import json
+import math
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List
+from typing import List, Optional
 
 from ..database import get_db
 from ..models.user import User
 from ..models.review import MovieReview
-from ..models.movie import Movie
 from ..schemas.user import User as UserSchema, UserCreate, UserUpdate
-from ..utils.auth import get_password_hash
+from ..schemas.review import UserReviewPage, UserReviewSummary
+from ..utils.auth import invalidate_principal, principal_cache
 from ..dependencies import get_current_user
+from ..services.detail_cache import movie_detail_cache
+from ..services.browse import facet_cache
+from ..services.collaborative import item_cf
+from ..services.rating_stats import apply_rating_changes, reconcile
+from ..services.review_store import delete_review_row, review_written, import_batch
+from ..services.review_search import remove_reviews
+from ..services import user_reviews
+from ..utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..services.review_queue import review_queue
+from ..services.password_hasher import password_hasher
+from ..services.token_revocation import token_revocations
 
 router = APIRouter()
 
@@ -24,7 +40,7 @@ def get_current_admin(current_user: User = Depends(get_current_user)):
 
 # 获取所有用户
 @router.get("/users", response_model=List[UserSchema])
-async def get_all_users(
+def get_all_users(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin)
 ):
@@ -39,6 +55,14 @@ async def update_user(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin)
 ):
+    # 等待 bcrypt 时不占用线程池，数据库操作仍在线程池中执行
+    hashed_password = None
+    if user_update.password is not None:
+        hashed_password = await password_hasher.hash_async(user_update.password)
+    return await run_in_threadpool(apply_user_update, db, user_id, user_update, hashed_password)
+
+def apply_user_update(db: Session, user_id: int, user_update: UserUpdate,
+                      hashed_password: Optional[str]) -> User:
     # 查找用户
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
@@ -65,8 +89,10 @@ async def update_user(
             )
         user.email = user_update.email
     
-    if user_update.password is not None:
-        user.hashed_password = get_password_hash(user_update.password)
+    if hashed_password is not None:
+        user.hashed_password = hashed_password
+        # 修改密码后已签发的令牌失效
+        user.token_version = (user.token_version or 0) + 1
     
     if user_update.avatar is not None:
         user.avatar = user_update.avatar
@@ -75,12 +101,13 @@ async def update_user(
         user.bio = user_update.bio
     
     db.commit()
+    invalidate_principal(user_id)
     db.refresh(user)
     return user
 
 # 删除用户
 @router.delete("/users/{user_id}", status_code=204)
-async def delete_user(
+def delete_user(
     user_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin)
@@ -95,50 +122,68 @@ async def delete_user(
         raise HTTPException(status_code=404, detail="用户不存在")
     
     try:
-        # 先删除用户所有评论（解决外键约束问题）
+        # 先删除用户所有评论（解决外键约束问题），同时扣减评分汇总
+        ratings = db.query(MovieReview.id, MovieReview.movie_id, MovieReview.rating)\
+            .filter(MovieReview.user_id == user_id).all()
+        apply_rating_changes(db, [(movie_id, rating, None) for _, movie_id, rating in ratings])
+        user_reviews.forget_user(db, user_id)
+        remove_reviews(db, [review_id for review_id, _, _ in ratings])
         db.query(MovieReview).filter(MovieReview.user_id == user_id).delete()
         
         # 再删除用户
         db.delete(user)
         db.commit()
+        invalidate_principal(user_id)
+        item_cf.forget_user(user_id)
+        for _, movie_id, _ in ratings:
+            movie_detail_cache.invalidate(movie_id)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"删除用户失败: {str(e)}")
 
 # 获取特定用户的评论
-@router.get("/users/{user_id}/reviews")
-async def get_user_reviews(
+def get_review_user(user_id: int, db: Session) -> User:
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="用户不存在")
+    return user
+
+@router.get("/users/{user_id}/reviews", response_model=UserReviewPage)
+def get_user_reviews(
     user_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin)
 ):
     # 查找用户
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="用户不存在")
-    
-    # 获取评论
-    reviews = db.query(MovieReview, Movie)\
-        .join(Movie, MovieReview.movie_id == Movie.id)\
-        .filter(MovieReview.user_id == user_id)\
-        .order_by(desc(MovieReview.created_at))\
-        .all()
-    
-    return [
-        {
-            "id": review.id,
-            "movie_id": review.movie_id,
-            "movie_title": movie.title,
-            "rating": review.rating,
-            "content": review.content,
-            "created_at": review.created_at
-        }
-        for review, movie in reviews
-    ]
+    get_review_user(user_id, db)
+    results, next_cursor = user_reviews.user_reviews_page(db, user_id, limit, cursor)
+    return {"results": results, "next_cursor": next_cursor}
+
+# 以 NDJSON 流式导出用户的全部评论
+@router.get("/users/{user_id}/reviews/stream")
+def stream_user_reviews(
+    user_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    get_review_user(user_id, db)
+    return StreamingResponse(user_reviews.stream_user_reviews(user_id), media_type="application/x-ndjson")
+
+# 用户评论汇总
+@router.get("/users/{user_id}/reviews/summary", response_model=UserReviewSummary)
+def get_user_review_summary(
+    user_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    get_review_user(user_id, db)
+    return user_reviews.user_summary(db, user_id)
 
 # 删除特定评论
 @router.delete("/reviews/{review_id}", status_code=204)
-async def delete_review(
+def delete_review(
     review_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin)
@@ -149,5 +194,118 @@ async def delete_review(
         raise HTTPException(status_code=404, detail="评论不存在")
     
     # 删除评论
-    db.delete(review)
-    db.commit() 
\ No newline at end of file
+    movie_id, user_id = review.movie_id, review.user_id
+    delete_review_row(db, review)
+    db.commit()
+    review_written(user_id, movie_id, None)
+
+# 批量导入评价：请求体为 NDJSON，每行 {"user_id", "movie_id", "rating", "content"}
+IMPORT_BATCH_SIZE = 500
+MAX_IMPORT_ERRORS = 100
+
+def parse_import_line(line_no: int, line: bytes) -> dict:
+    data = json.loads(line)
+    rating = float(data["rating"])
+    # float 可以解析出 nan/inf，与任何数比较都不会落在范围外
+    if not math.isfinite(rating) or rating < 1 or rating > 5:
+        raise ValueError("评分必须在1-5之间")
+    content = data.get("content")
+    return {
+        "line": line_no,
+        "user_id": int(data["user_id"]),
+        "movie_id": int(data["movie_id"]),
+        "rating": rating,
+        "content": str(content) if content is not None else None,
+    }
+
+@router.post("/reviews/import")
+async def import_reviews(
+    request: Request,
+    current_user: User = Depends(get_current_admin)
+):
+    # 边读边解析，攒满一批后在线程池中批量写入，请求体不会整体读入内存。
+    # 每批单独提交：某批失败时逐条重试，不影响已提交的批次和后续批次
+    imported, failed, errors = 0, 0, []
+    batch, buffer, line_no = [], b"", 0
+
+    def add_errors(messages):
+        nonlocal failed
+        failed += len(messages)
+        errors.extend(messages[:MAX_IMPORT_ERRORS - len(errors)])
+
+    async def flush():
+        nonlocal imported, batch
+        if not batch:
+            return
+        rows, batch = batch, []
+        try:
+            count, batch_errors = await asyncio.to_thread(import_batch, rows)
+        except Exception as e:
+            print(f"导入评价批次失败，逐条重试: {str(e)}")
+            count, batch_errors = 0, []
+            for row in rows:
+                try:
+                    row_count, row_errors = await asyncio.to_thread(import_batch, [row])
+                except Exception as e:
+                    row_count, row_errors = 0, [f"第{row['line']}行: 写入失败: {str(e)}"]
+                count += row_count
+                batch_errors.extend(row_errors)
+        imported += count
+        add_errors(batch_errors)
+
+    async def read_lines():
+        nonlocal buffer
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                yield line
+        if buffer:
+            yield buffer
+
+    async for line in read_lines():
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            batch.append(parse_import_line(line_no, line))
+        except (ValueError, KeyError, TypeError) as e:
+            add_errors([f"第{line_no}行: {str(e)}"])
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await flush()
+    await flush()
+
+    return {
+        "imported": imported,
+        "failed": failed,
+        "errors": errors
+    }
+
+# 从评价表全量重算评分汇总
+@router.post("/rating-stats/reconcile", status_code=204)
+def reconcile_rating_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    reconcile(db)
+    movie_detail_cache.clear()
+
+# 从评价表全量重算用户评价汇总
+@router.post("/user-stats/reconcile", status_code=204)
+def reconcile_user_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    user_reviews.reconcile(db)
+
+# 查看缓存命中情况
+@router.get("/cache/stats")
+async def get_cache_stats(current_user: User = Depends(get_current_admin)):
+    return {
+        "movie_detail": movie_detail_cache.stats(),
+        "browse_facets": facet_cache.stats(),
+        "review_writes": review_queue.stats(),
+        "principals": principal_cache.stats(),
+        "password_hash": password_hasher.stats(),
+        "token_revocations": token_revocations.stats()
+    }
@@ -1,62 +1,161 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func, text
+from sqlalchemy import text
 from typing import List, Optional
 from datetime import datetime, timedelta
 from ..database import get_db
 from ..models.movie import Movie
-from ..schemas.movie import Movie as MovieSchema, MovieDetail
+from ..models.tag import Tag, MovieTag
+from ..schemas.movie import Movie as MovieSchema, MovieDetail, MoviePage, MovieBrowsePage, MovieSuggestion
+from ..utils.pagination import paginate, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..utils.fields import parse_fields, movie_query, to_dicts
+from ..utils.tags import normalize_tag
+from ..services.sampler import movie_sampler
+from ..services.search_index import search_index
+from ..services.view_counter import view_counter
+from ..services.detail_cache import movie_detail_cache
+from ..services.browse import browse, resolve_tag_id, resolve_country_id
+from ..services.trending import trending
+from ..services.similarity import similarity_index, TOP_K as SIMILAR_TOP_K
+from ..services.collaborative import item_cf
+from ..services.suggest import suggest_index, MAX_SUGGESTIONS
+from ..dependencies import get_optional_user
+from ..models.user import User
 from sqlalchemy import or_
 
 router = APIRouter()
 
-@router.get("/hot", response_model=List[MovieSchema])
-async def get_hot_movies(limit: Optional[int] = None, db: Session = Depends(get_db)):
-    """获取热门电影（按年份排序）"""
-    query = db.query(Movie).order_by(Movie.years.desc())
-    if limit:
-        query = query.limit(limit)
-    return query.all()
+# 指定 fields 时查询结果只含基本类型，直接序列化返回，跳过 response_model 对未用字段的校验
+def page_response(movies, next_cursor: Optional[str], columns: Optional[List[str]]):
+    if columns is None:
+        return {"results": movies, "next_cursor": next_cursor}
+    return JSONResponse(content={"results": to_dicts(movies, columns), "next_cursor": next_cursor})
 
-@router.get("/rank", response_model=List[MovieSchema])
-async def get_ranked_movies(limit: Optional[int] = None, db: Session = Depends(get_db)):
-    """获取排行榜电影（按ID排序）"""
-    query = db.query(Movie).order_by(Movie.id.asc())
-    if limit:
-        query = query.limit(limit)
-    return query.all()
+def list_response(movies, columns: Optional[List[str]]):
+    if columns is None:
+        return movies
+    return JSONResponse(content=to_dicts(movies, columns))
+
+@router.get("", response_model=MoviePage)
+def list_movies(
+    tag: Optional[str] = Query(None, description="按标签过滤"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor"),
+    fields: Optional[str] = Query(None, description="返回字段，逗号分隔；card 为卡片预设"),
+    db: Session = Depends(get_db)
+):
+    """获取电影列表，可按标签过滤（游标分页）"""
+    columns = parse_fields(fields)
+    query = movie_query(db, columns)
+    if tag:
+        # 先按唯一索引找到标签，再走 movie_tags 主键索引
+        tag_id = db.query(Tag.id).filter(Tag.name == normalize_tag(tag)).scalar()
+        if tag_id is None:
+            return {"results": [], "next_cursor": None}
+        query = query.join(MovieTag, MovieTag.movie_id == Movie.id).filter(MovieTag.tag_id == tag_id)
+    movies, next_cursor = paginate(query, Movie.id, Movie.id, limit, cursor, descending=False)
+    return page_response(movies, next_cursor, columns)
+
+@router.get("/hot", response_model=MoviePage)
+def get_hot_movies(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor"),
+    fields: Optional[str] = Query(None, description="返回字段，逗号分隔；card 为卡片预设"),
+    db: Session = Depends(get_db)
+):
+    """获取热门电影（按时间衰减的浏览/评价热度排序，游标分页）"""
+    columns = parse_fields(fields)
+    movies, next_cursor = trending.hot_movies(db, limit, cursor, columns)
+    return page_response(movies, next_cursor, columns)
+
+@router.get("/rank", response_model=MoviePage)
+def get_ranked_movies(
+    by: str = Query("douban", pattern="^(douban|community)$",
+                    description="douban 为豆瓣榜单顺序，community 为结合站内评分的社区排行"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor"),
+    fields: Optional[str] = Query(None, description="返回字段，逗号分隔；card 为卡片预设"),
+    db: Session = Depends(get_db)
+):
+    """获取排行榜电影（默认按ID排序，by=community 按社区评分降序，游标分页）"""
+    columns = parse_fields(fields)
+    if by == "community":
+        # 社区评分随评价增量更新并建有 (community_score, id) 索引，排行只需扫描索引
+        movies, next_cursor = paginate(
+            movie_query(db, columns, Movie.community_score),
+            Movie.community_score, Movie.id, limit, cursor, descending=True
+        )
+    else:
+        movies, next_cursor = paginate(
+            movie_query(db, columns), Movie.id, Movie.id, limit, cursor, descending=False
+        )
+    return page_response(movies, next_cursor, columns)
 
 @router.get("/recommend", response_model=List[MovieSchema])
-async def get_recommended_movies(limit: Optional[int] = None, db: Session = Depends(get_db)):
-    """获取推荐电影（随机推荐）"""
-    query = db.query(Movie).order_by(text('RAND()'))
-    if limit:
-        query = query.limit(limit)
-    return query.all()
+def get_recommended_movies(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    tag: Optional[str] = Query(None, description="按标签过滤"),
+    year: Optional[int] = Query(None, description="按上映年份过滤"),
+    min_rating: Optional[float] = Query(None, ge=0, le=10, description="最低评分"),
+    fields: Optional[str] = Query(None, description="返回字段，逗号分隔；card 为卡片预设"),
+    db: Session = Depends(get_db),
+    current_user: Optional[User] = Depends(get_optional_user)
+):
+    """获取推荐电影：登录用户按评分做协同过滤推荐，未登录或指定过滤条件时随机推荐"""
+    columns = parse_fields(fields)
+    if current_user and tag is None and year is None and min_rating is None:
+        movies = item_cf.recommend(db, current_user.id, limit, columns)
+    else:
+        movies = movie_sampler.sample(db, limit, tag=tag, year=year, min_rating=min_rating, fields=columns)
+    return list_response(movies, columns)
+
+@router.get("/browse", response_model=MovieBrowsePage)
+def browse_movies(
+    year_from: Optional[int] = Query(None, description="起始年份"),
+    year_to: Optional[int] = Query(None, description="截止年份"),
+    country: Optional[str] = Query(None, description="国家/地区"),
+    tag: Optional[str] = Query(None, description="标签"),
+    min_rating: Optional[float] = Query(None, ge=0, le=10, description="最低评分"),
+    max_rating: Optional[float] = Query(None, ge=0, le=10, description="最高评分"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor"),
+    fields: Optional[str] = Query(None, description="返回字段，逗号分隔；card 为卡片预设"),
+    db: Session = Depends(get_db)
+):
+    """分面浏览电影，返回结果及各维度的分面计数"""
+    columns = parse_fields(fields)
+    filters = {
+        "year_from": year_from,
+        "year_to": year_to,
+        "country_id": resolve_country_id(db, country),
+        "tag_id": resolve_tag_id(db, tag),
+        "min_rating": min_rating,
+        "max_rating": max_rating,
+    }
+    page = browse(db, filters, limit, cursor, columns)
+    if columns is None:
+        return page
+    return JSONResponse(content={**page, "results": to_dicts(page["results"], columns)})
 
 @router.get("/search", response_model=List[MovieSchema])
-async def search_movies(
+def search_movies(
     keyword: str = Query(None, description="搜索关键词"),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="返回字段，逗号分隔；card 为卡片预设"),
     db: Session = Depends(get_db)
 ):
-    """根据电影名称搜索"""
+    """根据电影名称、主演、导演和标签搜索"""
+    columns = parse_fields(fields)
     try:
         if not keyword:
             return []
             
         # 处理关键词
         keyword = keyword.strip()
-        print(f"搜索关键词: {keyword}")  # 添加日志
             
-        # 只搜索电影标题
-        query = db.query(Movie).filter(
-            Movie.title.like(f"%{keyword}%")
-        ).order_by(desc(Movie.rating))  # 按评分排序
-        
-        movies = query.all()
-        print(f"搜索到 {len(movies)} 条结果")  # 添加日志
-            
-        return movies
+        # 倒排索引检索，按相关度和评分排序
+        return list_response(search_index.search(db, keyword, limit, columns), columns)
     except Exception as e:
         print(f"搜索电影失败: {str(e)}")
         raise HTTPException(
@@ -64,41 +163,72 @@ async def search_movies(
             detail="搜索失败，请重试"
         )
 
+@router.get("/suggest", response_model=List[MovieSuggestion])
+async def suggest_movies(
+    q: str = Query("", description="已输入的前缀，支持拼音及拼音首字母"),
+    limit: int = Query(8, ge=1, le=MAX_SUGGESTIONS)
+):
+    """搜索框联想（内存前缀索引，不访问数据库）"""
+    return suggest_index.suggest(q, limit)
+
 @router.get("/{movie_id}", response_model=MovieDetail)
-async def get_movie_detail(movie_id: int, db: Session = Depends(get_db)):
+def get_movie_detail(movie_id: int, db: Session = Depends(get_db)):
     """获取电影详情，包含基本信息和详细信息"""
     try:
-        # 联合查询两个表
-        sql = """
-            SELECT 
-                m.id, m.douban_id, m.title, m.description, m.rating, 
-                m.leader, m.tags, m.years, m.country, m.director_description, 
-                m.cover_image, m.view_count,
-                d.actors, d.plot, d.duration, 
-                d.comment1, d.comment2, d.comment3, d.comment4, d.comment5
-            FROM movies_top250 m
-            LEFT JOIN movie_details d ON m.douban_id = d.douban_id
-            WHERE m.id = :movie_id
-        """
-        
-        result = db.execute(text(sql), {"movie_id": movie_id}).first()
-        
-        if result is None:
-            raise HTTPException(status_code=404, detail="电影不存在")
-        
-        # 转换为字典，使用result._mapping来获取列名和值的映射
-        movie_data = dict(result._mapping)
-        
-        # 更新浏览量
-        movie = db.query(Movie).filter(Movie.id == movie_id).first()
-        if movie:
-            movie.view_count += 1
-            db.commit()
-            # 更新返回数据中的浏览量
-            movie_data['view_count'] = movie.view_count
+        cached = movie_detail_cache.get(movie_id)
+        if cached is None:
+            # 联合查询两个表
+            sql = """
+                SELECT 
+                    m.id, m.douban_id, m.title, m.description, m.rating, 
+                    m.leader, m.tags, m.years, m.release_year, m.country, m.director_description, 
+                    m.cover_image, m.view_count, m.community_score,
+                    d.actors, d.plot, d.duration, d.duration_minutes, 
+                    d.comment1, d.comment2, d.comment3, d.comment4, d.comment5,
+                    s.review_count, s.rating_sum,
+                    s.stars_1, s.stars_2, s.stars_3, s.stars_4, s.stars_5
+                FROM movies_top250 m
+                LEFT JOIN movie_details d ON m.douban_id = d.douban_id
+                LEFT JOIN movie_rating_stats s ON s.movie_id = m.id
+                WHERE m.id = :movie_id
+            """
+            
+            result = db.execute(text(sql), {"movie_id": movie_id}).first()
+            
+            if result is None:
+                raise HTTPException(status_code=404, detail="电影不存在")
+            
+            # 转换为字典，使用result._mapping来获取列名和值的映射
+            movie_data = dict(result._mapping)
+            # 评分汇总随详情一起查出，整理为接口字段
+            review_count = movie_data.pop('review_count') or 0
+            rating_sum = movie_data.pop('rating_sum') or 0
+            movie_data['review_count'] = review_count
+            movie_data['community_rating'] = round(rating_sum / review_count, 1) if review_count > 0 else None
+            movie_data['rating_histogram'] = [movie_data.pop(f'stars_{i}') or 0 for i in range(1, 6)]
+            # 数据库中的浏览量减去本进程已落库的部分，之后叠加累计浏览量即为最新值
+            view_offset = (movie_data['view_count'] or 0) - view_counter.flushed_count(movie_id)
+            cached = (movie_data, view_offset)
+            movie_detail_cache.set(movie_id, cached)
         
-        return movie_data
+        movie_data, view_offset = cached
+        # 浏览量先记入内存缓冲，由后台任务批量落库
+        trending.record_view(movie_id)
+        return {**movie_data, 'view_count': view_offset + view_counter.record(movie_id)}
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"获取电影详情错误: {str(e)}")  # 添加错误日志
-        raise HTTPException(status_code=500, detail=f"获取电影详情失败: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"获取电影详情失败: {str(e)}")
+
+@router.get("/{movie_id}/similar", response_model=List[MovieSchema])
+def get_similar_movies(
+    movie_id: int,
+    limit: int = Query(10, ge=1, le=SIMILAR_TOP_K),
+    fields: Optional[str] = Query(None, description="返回字段，逗号分隔；card 为卡片预设"),
+    db: Session = Depends(get_db)
+):
+    """获取相似电影（按标签、国家、导演、主演预先计算）"""
+    columns = parse_fields(fields)
+    return list_response(similarity_index.similar(db, movie_id, limit, columns), columns)
@@ -1,13 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from ..database import get_db
 from ..models.review import MovieReview
 from ..models.user import User
-from ..models.movie import Movie
-from ..schemas.review import ReviewCreate, ReviewResponse, ReviewList
+from ..models.rating_stats import MovieRatingStats
+from ..schemas.review import ReviewCreate, ReviewResponse, ReviewList, ReviewSearchPage, UserReviewPage, UserReviewSummary
 from ..dependencies import get_current_user
-from sqlalchemy import desc
+from ..services.review_store import delete_review_row, review_written
+from ..services import review_search
+from ..services.user_reviews import user_reviews_page, stream_user_reviews, user_summary
+from ..services.review_queue import write_review
+from ..utils.pagination import paginate, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 router = APIRouter()
 
@@ -18,46 +23,61 @@ async def create_review(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # 检查电影是否存在
-    movie = db.query(Movie).filter(Movie.id == movie_id).first()
-    if not movie:
-        raise HTTPException(status_code=404, detail="电影不存在")
-    
-    # 检查用户是否已经评价过这部电影
-    existing_review = db.query(MovieReview).filter(
-        MovieReview.user_id == current_user.id,
-        MovieReview.movie_id == movie_id
-    ).first()
-    
-    if existing_review:
-        # 更新已有评价
-        existing_review.rating = review.rating
-        existing_review.content = review.content
-        db.commit()
-        db.refresh(existing_review)
-        return {
-            **existing_review.__dict__,
-            "username": current_user.username
-        }
-    
-    # 创建新评价
-    db_review = MovieReview(
-        user_id=current_user.id,
-        movie_id=movie_id,
-        rating=review.rating,
-        content=review.content
-    )
-    db.add(db_review)
-    db.commit()
-    db.refresh(db_review)
+    # 新增或更新评价（唯一约束保证每个用户对每部电影只有一条），评分汇总在同一事务中更新
+    # 合并提交时在事件循环中等待批次结果，不占用线程池
+    review_id, created_at, _ = await write_review(db, current_user.id, movie_id, review.rating, review.content)
     
     return {
-        **db_review.__dict__,
+        "id": review_id,
+        "user_id": current_user.id,
+        "movie_id": movie_id,
+        "rating": review.rating,
+        "content": review.content,
+        "created_at": created_at,
         "username": current_user.username
     }
 
+@router.get("/movie/{movie_id}", response_model=ReviewList)
+def get_movie_reviews(
+    movie_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor"),
+    db: Session = Depends(get_db)
+):
+    """获取电影的全部评价（最新在前，游标分页）"""
+    # 用户名在同一次查询中关联取回
+    query = db.query(
+        MovieReview.id, MovieReview.user_id, MovieReview.movie_id, MovieReview.rating,
+        MovieReview.content, MovieReview.created_at, User.username
+    ).join(User, User.id == MovieReview.user_id)\
+        .filter(MovieReview.movie_id == movie_id)
+    rows, next_cursor = paginate(
+        query, MovieReview.created_at, MovieReview.id, limit, cursor, descending=True
+    )
+    # 总数取自评分汇总表，不对每页执行 COUNT(*)
+    total = db.query(MovieRatingStats.review_count)\
+        .filter(MovieRatingStats.movie_id == movie_id).scalar() or 0
+    return {
+        "results": [row._asdict() for row in rows],
+        "total": total,
+        "next_cursor": next_cursor
+    }
+
+@router.get("/search", response_model=ReviewSearchPage)
+def search_reviews(
+    q: str = Query(..., min_length=1, max_length=100, description="关键词"),
+    movie_id: Optional[int] = Query(None, description="只搜索该电影的评价"),
+    user_id: Optional[int] = Query(None, description="只搜索该用户的评价"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor"),
+    db: Session = Depends(get_db)
+):
+    """全文检索评价内容（最新在前，游标分页）"""
+    results, next_cursor = review_search.search_reviews(db, q, limit, cursor, movie_id, user_id)
+    return {"results": results, "next_cursor": next_cursor}
+
 @router.get("/{movie_id}", response_model=ReviewResponse)
-async def get_user_review(
+def get_user_review(
     movie_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -81,7 +101,7 @@ async def get_user_review(
     }
 
 @router.delete("/{movie_id}", status_code=204)
-async def delete_review(
+def delete_review(
     movie_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -94,8 +114,9 @@ async def delete_review(
     if not review:
         raise HTTPException(status_code=404, detail="评价不存在")
     
-    db.delete(review)
+    delete_review_row(db, review)
     db.commit()
+    review_written(current_user.id, movie_id, None)
 
 @router.post("/movies/{movie_id}/rate")
 async def rate_movie(
@@ -105,61 +126,35 @@ async def rate_movie(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    # 检查电影是否存在
-    movie = db.query(Movie).filter(Movie.id == movie_id).first()
-    if not movie:
-        raise HTTPException(status_code=404, detail="电影不存在")
-    
     # 检查评分范围
     if rating < 1 or rating > 5:
         raise HTTPException(status_code=400, detail="评分必须在1-5之间")
     
-    # 检查是否已经评价过
-    existing_review = db.query(MovieReview).filter(
-        MovieReview.user_id == current_user.id,
-        MovieReview.movie_id == movie_id
-    ).first()
-    
-    if existing_review:
-        # 更新已有评价
-        existing_review.rating = rating
-        existing_review.content = content
-        db.commit()
+    _, _, updated = await write_review(db, current_user.id, movie_id, rating, content)
+    if updated:
         return {"message": "评价已更新"}
-    
-    # 创建新评价
-    new_review = MovieReview(
-        user_id=current_user.id,
-        movie_id=movie_id,
-        rating=rating,
-        content=content
-    )
-    db.add(new_review)
-    db.commit()
     return {"message": "评价成功"}
 
-@router.get("/users/me/reviews")
-async def get_user_reviews(
+@router.get("/users/me/reviews", response_model=UserReviewPage)
+def get_user_reviews(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    reviews = db.query(MovieReview, Movie)\
-        .join(Movie, MovieReview.movie_id == Movie.id)\
-        .filter(MovieReview.user_id == current_user.id)\
-        .order_by(desc(MovieReview.created_at))\
-        .all()
-    
-    return [
-        {
-            "id": review.id,
-            "movie_id": review.movie_id,
-            "movie_title": movie.title,
-            "rating": review.rating,
-            "content": review.content,
-            "created_at": review.created_at,
-            "tags": movie.tags,
-            "year": movie.years,
-            "country": movie.country
-        }
-        for review, movie in reviews
-    ] 
\ No newline at end of file
+    """我的评价（最新在前，游标分页）"""
+    results, next_cursor = user_reviews_page(db, current_user.id, limit, cursor)
+    return {"results": results, "next_cursor": next_cursor}
+
+@router.get("/users/me/reviews/stream")
+def stream_my_reviews(current_user: User = Depends(get_current_user)):
+    """以 NDJSON 流式导出我的全部评价，每行一条"""
+    return StreamingResponse(stream_user_reviews(current_user.id), media_type="application/x-ndjson")
+
+@router.get("/users/me/reviews/summary", response_model=UserReviewSummary)
+def get_user_review_summary(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """我的评价汇总：数量、平均分，以及标签、国家、年份分布"""
+    return user_summary(db, current_user.id)
@@ -1,24 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
-from typing import List
+from typing import List, Optional
 
 from ..database import get_db
+from ..dependencies import optional_oauth2_scheme
 from ..models.user import User
-from ..schemas.user import UserCreate, User as UserSchema, Token, UserUpdate
+from ..schemas.user import UserCreate, User as UserSchema, Token, UserUpdate, RefreshRequest, LogoutRequest
+from ..services.password_hasher import password_hasher, rehash_if_needed
 from ..utils.auth import (
-    verify_password,
-    get_password_hash,
     create_access_token,
+    create_refresh_token,
+    decode_token,
+    revoke_token,
+    token_claims,
+    password_needs_update,
+    invalidate_principal,
     get_current_active_user,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
 
 router = APIRouter()
 
+def issue_tokens(user: User) -> dict:
+    """签发访问令牌和刷新令牌"""
+    claims = token_claims(user)
+    access_token = create_access_token(
+        data=claims, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {"access_token": access_token, "refresh_token": create_refresh_token(claims), "token_type": "bearer"}
+
+# 哈希相关的路由声明为 async：数据库操作放到线程池执行，等待 bcrypt 时不占用线程池
 @router.post("/register", response_model=UserSchema)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: Session = Depends(get_db)):
+    await run_in_threadpool(check_new_user, db, user)
+    hashed_password = await password_hasher.hash_async(user.password)
+    return await run_in_threadpool(create_user, db, user, hashed_password)
+
+def check_new_user(db: Session, user: UserCreate) -> None:
     # 检查用户名是否已存在
     db_user = db.query(User).filter(User.username == user.username).first()
     if db_user:
@@ -34,9 +55,9 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
             status_code=400,
             detail="邮箱已被注册"
         )
-    
+
+def create_user(db: Session, user: UserCreate, hashed_password: str) -> User:
     # 创建新用户
-    hashed_password = get_password_hash(user.password)
     db_user = User(
         username=user.username,
         email=user.email,
@@ -48,19 +69,45 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     return db_user
 
 @router.post("/token", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(
+    background_tasks: BackgroundTasks,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: Session = Depends(get_db)
+):
+    user = await run_in_threadpool(
+        lambda: db.query(User).filter(User.username == form_data.username).first()
+    )
+    # bcrypt 在专用线程池中计算，繁忙时返回 503
+    if not user or not await password_hasher.verify_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+    # 哈希方案或成本已调整时，响应返回后再重新计算
+    if password_needs_update(user.hashed_password):
+        background_tasks.add_task(rehash_if_needed, user.id, form_data.password, user.hashed_password)
+    return issue_tokens(user)
+
+@router.post("/token/refresh", response_model=Token)
+def refresh_token(request: RefreshRequest, db: Session = Depends(get_db)):
+    """用刷新令牌换取新的令牌对，旧的刷新令牌随即吊销（轮换）"""
+    payload = decode_token(request.refresh_token)
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="刷新令牌无效或已过期",
+        headers={"WWW-Authenticate": "Bearer"},
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    if payload is None or payload.get("type") != "refresh" or not payload.get("jti"):
+        raise invalid
+    user = db.query(User).filter(User.username == payload.get("sub")).first()
+    # 修改密码后令牌版本递增，旧的刷新令牌一并失效
+    if user is None or not user.is_active or (user.token_version or 0) != payload.get("ver", 0):
+        raise invalid
+    # 吊销写入即判重，同一刷新令牌被并发使用（包括在其他进程）时只有一次成功
+    if not revoke_token(db, payload):
+        raise invalid
+    return issue_tokens(user)
 
 @router.get("/me", response_model=UserSchema)
 async def read_users_me(current_user: User = Depends(get_current_active_user)):
@@ -72,42 +119,69 @@ async def update_user_me(
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
+    hashed_password = None
+    if user_update.password is not None:
+        hashed_password = await password_hasher.hash_async(user_update.password)
+    return await run_in_threadpool(apply_user_update, db, current_user.id, user_update, hashed_password)
+
+def apply_user_update(db: Session, user_id: int, user_update: UserUpdate,
+                      hashed_password: Optional[str]) -> User:
+    # current_user 来自认证缓存，修改前在当前会话中重新查询
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="用户不存在")
+
     # 更新用户信息
     if user_update.username is not None:
         # 检查新用户名是否已存在
         db_user = db.query(User).filter(User.username == user_update.username).first()
-        if db_user and db_user.id != current_user.id:
+        if db_user and db_user.id != user.id:
             raise HTTPException(
                 status_code=400,
                 detail="用户名已被使用"
             )
-        current_user.username = user_update.username
+        user.username = user_update.username
     
     if user_update.email is not None:
         # 检查新邮箱是否已存在
         db_user = db.query(User).filter(User.email == user_update.email).first()
-        if db_user and db_user.id != current_user.id:
+        if db_user and db_user.id != user.id:
             raise HTTPException(
                 status_code=400,
                 detail="邮箱已被使用"
             )
-        current_user.email = user_update.email
+        user.email = user_update.email
     
-    if user_update.password is not None:
-        current_user.hashed_password = get_password_hash(user_update.password)
+    if hashed_password is not None:
+        user.hashed_password = hashed_password
+        # 修改密码后已签发的令牌失效
+        user.token_version = (user.token_version or 0) + 1
     
     if user_update.avatar is not None:
-        current_user.avatar = user_update.avatar
+        user.avatar = user_update.avatar
     
     if user_update.bio is not None:
-        current_user.bio = user_update.bio
+        user.bio = user_update.bio
     
     db.commit()
-    db.refresh(current_user)
-    return current_user
+    invalidate_principal(user.id)
+    db.refresh(user)
+    return user
 
 @router.post("/logout")
-async def logout():
-    # 由于使用的是JWT，服务器端不需要维护session
-    # 客户端会自行清除token
+def logout(
+    request: Optional[LogoutRequest] = None,
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    db: Session = Depends(get_db)
+):
+    """吊销当前访问令牌及请求体中的刷新令牌，之后二者都不能再使用"""
+    access = decode_token(token) if token else None
+    if access is not None:
+        revoke_token(db, access)
+    if request is not None and request.refresh_token:
+        refresh = decode_token(request.refresh_token)
+        # 只吊销属于同一用户的刷新令牌
+        if refresh is not None and refresh.get("type") == "refresh" \
+                and (access is None or refresh.get("sub") == access.get("sub")):
+            revoke_token(db, refresh)
     return {"message": "登出成功"} 
\ No newline at end of file
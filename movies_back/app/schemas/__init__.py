@@ -2,6 +2,6 @@
 数据模式包
 """ 
 
-from .user import User, UserCreate, UserUpdate, Token, TokenData
-from .movie import Movie, MovieCreate, MovieUpdate
-from .review import ReviewCreate, ReviewResponse, ReviewList
+from .user import User, UserCreate, UserUpdate, Token, TokenData, RefreshRequest, LogoutRequest
+from .movie import Movie, MovieCreate, MovieUpdate, MoviePage, MovieBrowsePage, MovieSuggestion
+from .review import ReviewCreate, ReviewResponse, ReviewList, ReviewSearchPage, UserReviewPage, UserReviewSummary
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 class MovieBase(BaseModel):
     title: str
@@ -18,7 +18,9 @@ class MovieCreate(MovieBase):
 
 class Movie(MovieBase):
     id: int
+    release_year: Optional[int] = None
     view_count: int = 0
+    community_score: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -27,15 +29,42 @@ class MovieDetail(Movie):
     actors: Optional[str] = None
     plot: Optional[str] = None
     duration: Optional[str] = None
+    duration_minutes: Optional[int] = None
     comment1: Optional[str] = None
     comment2: Optional[str] = None
     comment3: Optional[str] = None
     comment4: Optional[str] = None
     comment5: Optional[str] = None
+    # 站内用户评分汇总
+    review_count: int = 0
+    community_rating: Optional[float] = None
+    rating_histogram: List[int] = [0, 0, 0, 0, 0]  # 1-5 星的人数
 
     class Config:
         from_attributes = True
 
+# 游标分页的电影列表
+class MoviePage(BaseModel):
+    results: List[Movie]
+    next_cursor: Optional[str] = None
+
+# 分面浏览
+class FacetValue(BaseModel):
+    value: str
+    count: int
+
+class MovieBrowsePage(MoviePage):
+    total: int
+    facets: Dict[str, List[FacetValue]]
+
+# 搜索框联想
+class MovieSuggestion(BaseModel):
+    id: int
+    title: str
+    years: Optional[str] = None
+    field: str       # 匹配的字段：title/director/leader
+    matched: str     # 匹配到的文本
+
 # 用于更新的Schema
 class MovieUpdate(BaseModel):
     title: Optional[str] = None
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, confloat
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
+from .movie import FacetValue
 
 class ReviewBase(BaseModel):
     rating: confloat(ge=1, le=5)  # 限制评分在1-5之间
@@ -23,4 +24,29 @@ class ReviewResponse(ReviewInDB):
 
 class ReviewList(BaseModel):
     results: List[ReviewResponse]
-    total: int 
\ No newline at end of file
+    total: int
+    next_cursor: Optional[str] = None 
+
+# 评价全文检索
+class ReviewSearchPage(BaseModel):
+    results: List[ReviewResponse]
+    next_cursor: Optional[str] = None
+
+# 用户的评价历史
+class UserReviewItem(BaseModel):
+    id: int
+    movie_id: int
+    movie_title: Optional[str] = None
+    year: Optional[str] = None
+    rating: float
+    content: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+class UserReviewPage(BaseModel):
+    results: List[UserReviewItem]
+    next_cursor: Optional[str] = None
+
+class UserReviewSummary(BaseModel):
+    review_count: int
+    average_rating: Optional[float] = None
+    facets: Dict[str, List[FacetValue]]  # tag/country/year
@@ -0,0 +1,3 @@
+"""
+业务服务包
+""" 
\ No newline at end of file
@@ -0,0 +1,127 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..models.movie import Movie
+from ..models.tag import Tag, MovieTag
+from ..models.country import Country, MovieCountry
+from ..utils.cache import LRUCache
+from ..utils.fields import movie_query
+from ..utils.pagination import paginate
+from ..utils.tags import normalize_tag
+
+# 分面统计缓存，按过滤条件组合缓存
+FACET_CACHE_SIZE = 512
+FACET_CACHE_TTL = 600
+# 每个分面最多返回的取值数量
+FACET_LIMIT = 30
+
+# 评分区间分面：(名称, 下限, 上限)
+RATING_BUCKETS = [
+    ("9分以上", 9, None),
+    ("8-9分", 8, 9),
+    ("7-8分", 7, 8),
+    ("6-7分", 6, 7),
+    ("6分以下", None, 6),
+]
+
+facet_cache = LRUCache(maxsize=FACET_CACHE_SIZE, ttl=FACET_CACHE_TTL)
+
+def resolve_tag_id(db: Session, tag: Optional[str]) -> Optional[int]:
+    """标签名转为标签id，不存在时返回-1使查询为空"""
+    if not tag:
+        return None
+    tag_id = db.query(Tag.id).filter(Tag.name == normalize_tag(tag)).scalar()
+    return tag_id if tag_id is not None else -1
+
+def resolve_country_id(db: Session, country: Optional[str]) -> Optional[int]:
+    """国家名转为国家id，不存在时返回-1使查询为空"""
+    if not country:
+        return None
+    country_id = db.query(Country.id).filter(Country.name == country.strip()).scalar()
+    return country_id if country_id is not None else -1
+
+def apply_filters(query, filters: Dict, exclude: Optional[str] = None):
+    """应用过滤条件，exclude 指定的维度不参与过滤（用于计算该维度的分面）"""
+    if exclude != "year":
+        if filters.get("year_from") is not None:
+            query = query.filter(Movie.release_year >= filters["year_from"])
+        if filters.get("year_to") is not None:
+            query = query.filter(Movie.release_year <= filters["year_to"])
+    if exclude != "country" and filters.get("country_id") is not None:
+        query = query.join(MovieCountry, MovieCountry.movie_id == Movie.id)\
+            .filter(MovieCountry.country_id == filters["country_id"])
+    if exclude != "tag" and filters.get("tag_id") is not None:
+        query = query.join(MovieTag, MovieTag.movie_id == Movie.id)\
+            .filter(MovieTag.tag_id == filters["tag_id"])
+    if exclude != "rating":
+        if filters.get("min_rating") is not None:
+            query = query.filter(Movie.rating >= filters["min_rating"])
+        if filters.get("max_rating") is not None:
+            query = query.filter(Movie.rating <= filters["max_rating"])
+    return query
+
+def _counts(rows) -> List[Dict]:
+    return [{"value": str(value), "count": count} for value, count in rows if value]
+
+def compute_facets(db: Session, filters: Dict) -> Dict:
+    """计算每个维度的分面计数（该维度自身的过滤条件不参与，便于切换取值）"""
+    facets = {}
+
+    rows = apply_filters(db.query(Movie.release_year, func.count(Movie.id)), filters, exclude="year")\
+        .filter(Movie.release_year.isnot(None))\
+        .group_by(Movie.release_year).order_by(Movie.release_year.desc())\
+        .limit(FACET_LIMIT).all()
+    facets["year"] = _counts(rows)
+
+    country_query = db.query(Country.name, func.count(MovieCountry.movie_id))\
+        .join(MovieCountry, MovieCountry.country_id == Country.id)\
+        .join(Movie, Movie.id == MovieCountry.movie_id)
+    rows = apply_filters(country_query, filters, exclude="country")\
+        .group_by(Country.id, Country.name)\
+        .order_by(func.count(MovieCountry.movie_id).desc())\
+        .limit(FACET_LIMIT).all()
+    facets["country"] = _counts(rows)
+
+    tag_query = db.query(Tag.name, func.count(MovieTag.movie_id))\
+        .join(MovieTag, MovieTag.tag_id == Tag.id)\
+        .join(Movie, Movie.id == MovieTag.movie_id)
+    rows = apply_filters(tag_query, filters, exclude="tag")\
+        .group_by(Tag.id, Tag.name)\
+        .order_by(func.count(MovieTag.movie_id).desc())\
+        .limit(FACET_LIMIT).all()
+    facets["tag"] = _counts(rows)
+
+    rows = apply_filters(db.query(func.floor(Movie.rating), func.count(Movie.id)), filters, exclude="rating")\
+        .filter(Movie.rating.isnot(None))\
+        .group_by(func.floor(Movie.rating)).all()
+    by_floor = {int(value): count for value, count in rows if value is not None}
+    facets["rating"] = []
+    for name, low, high in RATING_BUCKETS:
+        count = sum(c for f, c in by_floor.items()
+                    if (low is None or f >= low) and (high is None or f < high))
+        facets["rating"].append({"value": name, "count": count})
+
+    return facets
+
+def get_facets(db: Session, filters: Dict) -> Dict:
+    """分面计数与结果总数，按过滤条件组合缓存"""
+    key = tuple(sorted((k, v) for k, v in filters.items() if v is not None))
+    cached = facet_cache.get(key)
+    if cached is None:
+        cached = {
+            "total": apply_filters(db.query(func.count(Movie.id)), filters).scalar(),
+            "facets": compute_facets(db, filters),
+        }
+        facet_cache.set(key, cached)
+    return cached
+
+def browse(db: Session, filters: Dict, limit: int, cursor: Optional[str] = None,
+           fields: Optional[List[str]] = None) -> Dict:
+    """按过滤条件分页浏览电影（评分降序），并附带分面计数"""
+    movies, next_cursor = paginate(
+        apply_filters(movie_query(db, fields, Movie.rating), filters),
+        Movie.rating, Movie.id, limit, cursor, descending=True
+    )
+    return {"results": movies, "next_cursor": next_cursor, **get_facets(db, filters)}
@@ -0,0 +1,245 @@
+"""
+基于物品的协同过滤推荐
+用户评分（1-5）减去量表中值作为偏好值，喜欢为正、不喜欢为负。
+全量构建时用稀疏矩阵 R（用户×电影）计算 G = RᵀR，余弦相似度 sim(i, j) = G[i, j] / (|i| |j|)，
+每部电影保留前 NEIGHBOURS 个正相似的邻居。
+以固定中值而非用户均值中心化，一条评分变化只影响该用户评过的电影之间的内积，因此可以在写评价时增量维护，
+后台任务再定期从数据库全量重建，合并其他进程写入的评价。
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.review import MovieReview
+from ..utils.fields import load_movies
+from ..utils.periodic import PeriodicTask
+from .sampler import movie_sampler
+
+# 评分量表中值
+RATING_MIDPOINT = 3.0
+# 每部电影保留的邻居数量
+NEIGHBOURS = 50
+# 后台更新邻居列表、从数据库全量重建的间隔（秒）
+TICK_INTERVAL = 30
+REBUILD_INTERVAL = 3600
+
+def top_neighbours(ids: np.ndarray, sims: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """取相似度为正的前 NEIGHBOURS 项，按相似度降序"""
+    keep = sims > 0
+    ids, sims = ids[keep], sims[keep]
+    if len(sims) > NEIGHBOURS:
+        top = np.argpartition(-sims, NEIGHBOURS - 1)[:NEIGHBOURS]
+        ids, sims = ids[top], sims[top]
+    order = np.argsort(-sims, kind="stable")
+    return ids[order], sims[order]
+
+class ItemCF:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        # 用户 -> {电影: 偏好值}
+        self.user_ratings: Dict[int, Dict[int, float]] = {}
+        # 电影两两之间的内积（只保存非对角项）与各电影的平方和
+        self.dots: Dict[int, Dict[int, float]] = {}
+        self.norms: Dict[int, float] = {}
+        # 电影 -> (邻居id数组, 相似度数组)
+        self.neighbours: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self.dirty: Set[int] = set()
+        # 全量重建期间写入的评分，重建完成后重放
+        self.journal: Optional[List[Tuple[int, int, Optional[float]]]] = None
+        self.built_at = 0.0
+        self.task = PeriodicTask(self.tick, TICK_INTERVAL)
+
+    def record(self, user_id: int, movie_id: int, rating: Optional[float]) -> None:
+        """评价写入后调用，rating 为 None 表示评价被删除"""
+        with self.lock:
+            self._apply(user_id, movie_id, rating)
+            if self.journal is not None:
+                self.journal.append((user_id, movie_id, rating))
+
+    def forget_user(self, user_id: int) -> None:
+        """用户被删除时移除其全部评分"""
+        with self.lock:
+            for movie_id in list(self.user_ratings.get(user_id, ())):
+                self._apply(user_id, movie_id, None)
+                if self.journal is not None:
+                    self.journal.append((user_id, movie_id, None))
+
+    def _apply(self, user_id: int, movie_id: int, rating: Optional[float]) -> None:
+        ratings = self.user_ratings.setdefault(user_id, {})
+        old = ratings.get(movie_id, 0.0)
+        new = rating - RATING_MIDPOINT if rating is not None else 0.0
+        delta = new - old
+        if delta:
+            for other, value in ratings.items():
+                if other == movie_id or not value:
+                    continue
+                row = self.dots.setdefault(movie_id, {})
+                row[other] = row.get(other, 0.0) + delta * value
+                self.dots.setdefault(other, {})[movie_id] = row[other]
+                self.dirty.add(other)
+            self.norms[movie_id] = self.norms.get(movie_id, 0.0) + new * new - old * old
+        self.dirty.add(movie_id)
+        if rating is None:
+            ratings.pop(movie_id, None)
+        else:
+            ratings[movie_id] = new
+
+    def refresh_dirty(self) -> int:
+        """重新计算评分有变化的电影的邻居列表"""
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+            rows = {i: (dict(self.dots.get(i, {})), self.norms.get(i, 0.0)) for i in dirty}
+            norms = dict(self.norms)
+        for movie_id, (row, norm) in rows.items():
+            if norm <= 1e-9 or not row:
+                self.neighbours.pop(movie_id, None)
+                continue
+            ids = np.fromiter(row.keys(), dtype=np.int64, count=len(row))
+            dots = np.fromiter(row.values(), dtype=np.float64, count=len(row))
+            other_norms = np.array([norms.get(j, 0.0) for j in ids])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                sims = np.where(other_norms > 1e-9, dots / np.sqrt(norm * other_norms), 0.0)
+            self.neighbours[movie_id] = top_neighbours(ids, sims)
+        return len(rows)
+
+    def _build(self, ratings: Dict[Tuple[int, int], float]):
+        """由 {(用户, 电影): 偏好值} 计算内积矩阵和邻居列表"""
+        user_ids = sorted({u for u, _ in ratings})
+        movie_ids = np.array(sorted({m for _, m in ratings}), dtype=np.int64)
+        user_index = {u: i for i, u in enumerate(user_ids)}
+        movie_index = {int(m): i for i, m in enumerate(movie_ids)}
+        matrix = sparse.csr_matrix(
+            (np.fromiter(ratings.values(), dtype=np.float64, count=len(ratings)),
+             ([user_index[u] for u, _ in ratings], [movie_index[m] for _, m in ratings])),
+            shape=(len(user_ids), len(movie_ids)),
+        )
+
+        gram = (matrix.T @ matrix).tocsr()
+        norms = gram.diagonal()
+        inverse = np.zeros_like(norms)
+        np.divide(1.0, np.sqrt(norms), out=inverse, where=norms > 1e-9)
+        sims = (sparse.diags(inverse) @ gram @ sparse.diags(inverse)).tocsr()
+        sims.setdiag(0)
+        sims.eliminate_zeros()
+
+        neighbours = {}
+        for i in range(len(movie_ids)):
+            start, end = sims.indptr[i], sims.indptr[i + 1]
+            if start < end:
+                neighbours[int(movie_ids[i])] = top_neighbours(
+                    movie_ids[sims.indices[start:end]], sims.data[start:end])
+
+        dots = {}
+        for i in range(len(movie_ids)):
+            start, end = gram.indptr[i], gram.indptr[i + 1]
+            row = dict(zip(movie_ids[gram.indices[start:end]].tolist(), gram.data[start:end].tolist()))
+            row.pop(int(movie_ids[i]), None)
+            if row:
+                dots[int(movie_ids[i])] = row
+
+        return movie_ids, norms, neighbours, dots
+
+    def rebuild(self, db: Session) -> None:
+        """从 movie_reviews 全量构建相似度（稀疏矩阵向量化计算）"""
+        with self.lock:
+            self.journal = []
+        try:
+            ratings: Dict[Tuple[int, int], float] = {}
+            for user_id, movie_id, rating in db.query(
+                    MovieReview.user_id, MovieReview.movie_id, MovieReview.rating).all():
+                ratings[(user_id, movie_id)] = float(rating) - RATING_MIDPOINT
+
+            neighbours, dots = {}, {}
+            movie_ids, norms = np.zeros(0, dtype=np.int64), np.zeros(0)
+            if ratings:
+                movie_ids, norms, neighbours, dots = self._build(ratings)
+
+            user_ratings: Dict[int, Dict[int, float]] = {}
+            for (user_id, movie_id), value in ratings.items():
+                user_ratings.setdefault(user_id, {})[movie_id] = value
+        except Exception:
+            with self.lock:
+                self.journal = None
+            raise
+
+        with self.lock:
+            self.user_ratings = user_ratings
+            self.dots = dots
+            self.norms = {int(m): float(n) for m, n in zip(movie_ids, norms)}
+            self.neighbours = neighbours
+            self.dirty = set()
+            # 重放构建期间的写入；按绝对值设置，已包含在快照中的记录重放也不会重复计入
+            journal, self.journal = self.journal, None
+            for user_id, movie_id, rating in journal:
+                self._apply(user_id, movie_id, rating)
+        self.refresh_dirty()
+        self.built_at = time.monotonic()
+
+    def recommend_ids(self, user_id: int, k: int) -> List[int]:
+        """按用户评过的电影的邻居加权求和，返回得分最高的k部未评价电影"""
+        with self.lock:
+            ratings = dict(self.user_ratings.get(user_id, {}))
+        ids, contributions = [], []
+        for movie_id, value in ratings.items():
+            entry = self.neighbours.get(movie_id)
+            if entry is None or not value:
+                continue
+            ids.append(entry[0])
+            contributions.append(entry[1] * value)
+        if not ids:
+            return []
+        candidates, inverse = np.unique(np.concatenate(ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions))
+        rated = np.fromiter(ratings.keys(), dtype=np.int64, count=len(ratings))
+        scores[np.isin(candidates, rated)] = 0
+        positive = np.flatnonzero(scores > 0)
+        if len(positive) > k:
+            positive = positive[np.argpartition(-scores[positive], k - 1)[:k]]
+        order = positive[np.argsort(-scores[positive], kind="stable")]
+        return candidates[order].tolist()
+
+    def recommend(self, db: Session, user_id: int, k: int, fields: Optional[List[str]] = None) -> List:
+        """个性化推荐，结果不足k部时用随机推荐补齐"""
+        ids = self.recommend_ids(user_id, k)
+        if len(ids) < k:
+            movie_sampler.ensure_fresh(db)
+            with self.lock:
+                seen = set(ids) | set(self.user_ratings.get(user_id, ()))
+            for movie_id in movie_sampler.sample_ids(k + len(seen)):
+                if len(ids) >= k:
+                    break
+                if movie_id not in seen:
+                    ids.append(movie_id)
+                    seen.add(movie_id)
+        return load_movies(db, ids, fields)
+
+    def tick(self) -> None:
+        """更新有变化的邻居列表，到期时全量重建"""
+        if not self.build_lock.acquire(blocking=False):
+            return
+        db = SessionLocal()
+        try:
+            if time.monotonic() - self.built_at >= REBUILD_INTERVAL:
+                self.rebuild(db)
+            else:
+                self.refresh_dirty()
+        except Exception as e:
+            print(f"更新协同过滤模型失败: {str(e)}")
+        finally:
+            db.close()
+            self.build_lock.release()
+
+    def start(self):
+        """在应用启动时开启后台任务"""
+        self.task.start()
+
+    async def stop(self):
+        await self.task.stop()
+
+item_cf = ItemCF()
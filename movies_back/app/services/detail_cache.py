@@ -0,0 +1,104 @@
+import time
+from typing import Optional, Tuple
+
+from sqlalchemy import func, text
+
+from ..database import SessionLocal
+from ..models.cache_invalidation import CacheInvalidation
+from ..utils.cache import LRUCache
+from ..utils.periodic import PeriodicTask
+from .sampler import movie_sampler
+from .browse import facet_cache
+from .similarity import similarity_index
+from .suggest import suggest_index
+from .search_index import search_index
+
+# 详情缓存容量与过期时间（秒）
+DETAIL_CACHE_SIZE = 2048
+DETAIL_CACHE_TTL = 600
+# 轮询失效通知的间隔（秒）
+POLL_INTERVAL = 5
+# 失效通知保留时长（秒），过期的记录定期清理
+INVALIDATION_RETENTION = 86400
+
+class MovieDetailCache:
+    """
+    电影详情缓存，按电影id缓存 movies_top250 LEFT JOIN movie_details 的结果。
+    爬虫在独立进程中运行，写入后向 cache_invalidations 表追加通知，
+    这里按间隔轮询并清理对应条目。
+    """
+
+    def __init__(self, maxsize: int = DETAIL_CACHE_SIZE, ttl: float = DETAIL_CACHE_TTL):
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.last_invalidation_id: Optional[int] = None
+        self.cleaned_at = 0.0
+        self.task = PeriodicTask(self.poll_invalidations, POLL_INTERVAL)
+
+    def get(self, movie_id: int) -> Optional[Tuple[dict, int]]:
+        """返回 (详情数据, 浏览量偏移)"""
+        return self.cache.get(movie_id)
+
+    def set(self, movie_id: int, entry: Tuple[dict, int]) -> None:
+        self.cache.set(movie_id, entry)
+
+    def invalidate(self, movie_id: int) -> None:
+        """按电影id清理缓存"""
+        self.cache.pop(movie_id)
+
+    def invalidate_douban_id(self, douban_id: str) -> int:
+        """按豆瓣id清理缓存（爬虫只知道豆瓣id）"""
+        return self.cache.discard_where(lambda _, entry: entry[0].get('douban_id') == douban_id)
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+    def poll_invalidations(self) -> int:
+        """读取新的失效通知并清理缓存，返回处理的通知数"""
+        db = SessionLocal()
+        try:
+            if self.last_invalidation_id is None:
+                # 启动时缓存为空，只需从当前位置开始
+                self.last_invalidation_id = db.query(func.max(CacheInvalidation.id)).scalar() or 0
+                return 0
+
+            rows = db.query(CacheInvalidation.id, CacheInvalidation.douban_id)\
+                .filter(CacheInvalidation.id > self.last_invalidation_id)\
+                .order_by(CacheInvalidation.id)\
+                .limit(1000)\
+                .all()
+            for row_id, douban_id in rows:
+                self.invalidate_douban_id(douban_id)
+                self.last_invalidation_id = row_id
+            if rows:
+                # 电影目录有变化，推荐候选池、分面统计、相似电影、联想和搜索索引也需要更新
+                movie_sampler.mark_stale()
+                facet_cache.clear()
+                similarity_index.mark_stale()
+                suggest_index.mark_stale()
+                search_index.mark_stale()
+
+            if time.monotonic() - self.cleaned_at > INVALIDATION_RETENTION / 24:
+                db.query(CacheInvalidation)\
+                    .filter(text(f"created_at < NOW() - INTERVAL {INVALIDATION_RETENTION} SECOND"))\
+                    .delete(synchronize_session=False)
+                db.commit()
+                self.cleaned_at = time.monotonic()
+            return len(rows)
+        except Exception as e:
+            db.rollback()
+            print(f"轮询缓存失效通知失败: {str(e)}")
+            return 0
+        finally:
+            db.close()
+
+    def start(self):
+        """在应用启动时开启失效通知轮询"""
+        self.task.start()
+
+    async def stop(self):
+        await self.task.stop()
+
+movie_detail_cache = MovieDetailCache()
@@ -0,0 +1,191 @@
+"""
+密码哈希线程池
+bcrypt 每次计算耗时数十毫秒，在路由线程里直接计算时，一波登录请求会占满 anyio 线程池，其他接口只能排队。
+哈希与校验改为提交到专用线程池（bcrypt 计算期间释放 GIL，线程数取 CPU 核数即可并行），
+池满且等待队列也满时立即返回 503 和 Retry-After，而不是让请求无限堆积。
+路由使用 verify_async/hash_async 并声明为 async，等待哈希结果期间不占用 anyio 线程池，
+登录高峰不会挤占其他接口的数据库查询。
+登录成功后如果哈希的方案或成本已过期，在后台用当前配置重新计算。
+
+压测：python -m app.services.password_hasher --bench
+各方案、成本的校验耗时：python -m app.services.password_hasher --latency bcrypt:10 bcrypt:12 pbkdf2_sha256:300000
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List
+
+from fastapi import HTTPException
+from sqlalchemy import update
+
+from ..database import SessionLocal
+from ..models.user import User
+from ..utils.auth import (
+    verify_password,
+    get_password_hash,
+    password_needs_update,
+    build_password_context,
+    invalidate_principal,
+)
+
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+# 允许排队等待的请求数，超出后拒绝
+HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE", str(HASH_WORKERS * 4)))
+# 拒绝时建议客户端等待的秒数
+RETRY_AFTER = 1
+
+class PasswordHasher:
+    def __init__(self, workers: int = HASH_WORKERS, queue_size: int = HASH_QUEUE_SIZE):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        # 执行中与排队中的任务总数上限
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.completed = 0
+        self.rejected = 0
+
+    def _submit(self, fn: Callable, *args) -> Future:
+        if not self.slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="服务繁忙，请稍后重试",
+                headers={"Retry-After": str(RETRY_AFTER)},
+            )
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, _future: Future) -> None:
+        self.completed += 1
+        self.slots.release()
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """在哈希线程池中校验密码，繁忙时抛出 503"""
+        return self._submit(verify_password, plain_password, hashed_password).result()
+
+    def hash(self, password: str) -> str:
+        """在哈希线程池中计算密码哈希，繁忙时抛出 503"""
+        return self._submit(get_password_hash, password).result()
+
+    async def verify_async(self, plain_password: str, hashed_password: str) -> bool:
+        """verify 的异步版本，在事件循环中等待结果"""
+        return await asyncio.wrap_future(self._submit(verify_password, plain_password, hashed_password))
+
+    async def hash_async(self, password: str) -> str:
+        """hash 的异步版本，在事件循环中等待结果"""
+        return await asyncio.wrap_future(self._submit(get_password_hash, password))
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+password_hasher = PasswordHasher()
+
+async def rehash_if_needed(user_id: int, password: str, old_hash: str) -> None:
+    """
+    登录成功后调用（作为后台任务）：哈希已过期时按当前配置重新计算并写回。
+    只在哈希未被并发修改时写入；线程池繁忙时跳过，下次登录再试。
+    """
+    if not password_needs_update(old_hash):
+        return
+    try:
+        new_hash = await password_hasher.hash_async(password)
+    except HTTPException:
+        return
+    await asyncio.to_thread(save_rehash, user_id, old_hash, new_hash)
+
+def save_rehash(user_id: int, old_hash: str, new_hash: str) -> None:
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            update(User)
+            .where(User.id == user_id, User.hashed_password == old_hash)
+            .values(hashed_password=new_hash)
+        )
+        db.commit()
+        if result.rowcount:
+            invalidate_principal(user_id)
+    except Exception as e:
+        db.rollback()
+        print(f"更新密码哈希失败: {str(e)}")
+    finally:
+        db.close()
+
+def benchmark(requests: int, clients: int) -> None:
+    """不同线程数下的校验吞吐量：clients 个并发客户端共发起 requests 次校验"""
+    hashed = get_password_hash("benchmark-password")
+    counts = sorted({1, 2, 4, 8, os.cpu_count() or 1})
+    print(f"CPU 核数: {os.cpu_count()}，请求数: {requests}，并发客户端: {clients}")
+    print(f"{'线程数':>6} {'吞吐量(次/秒)':>14} {'平均耗时(ms)':>12} {'拒绝':>6}")
+    for workers in counts:
+        hasher = PasswordHasher(workers=workers, queue_size=clients)
+        latencies, lock = [], threading.Lock()
+        remaining = iter(range(requests))
+
+        def client():
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                start = time.perf_counter()
+                try:
+                    hasher.verify("benchmark-password", hashed)
+                except HTTPException:
+                    continue
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        hasher.shutdown()
+        average = sum(latencies) / len(latencies) * 1000 if latencies else 0.0
+        print(f"{workers:>6} {len(latencies) / elapsed:>14.1f} {average:>12.1f} {hasher.rejected:>6}")
+
+def latency_benchmark(settings: List[str], repeat: int) -> None:
+    """单线程测量各 "方案:成本" 的一次校验耗时，成本省略时使用 passlib 默认值"""
+    print(f"{'方案':<16} {'成本':>8} {'平均(ms)':>10} {'P95(ms)':>10}")
+    for setting in settings:
+        scheme, _, rounds = setting.partition(":")
+        context = build_password_context([scheme], int(rounds) if rounds else None)
+        hashed = context.hash("benchmark-password")
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            context.verify("benchmark-password", hashed)
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        print(f"{scheme:<16} {rounds or '默认':>8} {sum(samples) / len(samples):>10.1f} {p95:>10.1f}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="密码哈希线程池")
+    parser.add_argument('--bench', action='store_true', help='测试不同线程数下的登录校验吞吐量')
+    parser.add_argument('--requests', type=int, default=200, help='校验次数')
+    parser.add_argument('--clients', type=int, default=32, help='并发客户端数')
+    parser.add_argument('--latency', nargs='+', metavar='SCHEME[:ROUNDS]',
+                        help='测试各方案、成本的校验耗时，如 bcrypt:12 pbkdf2_sha256:300000')
+    parser.add_argument('--repeat', type=int, default=20, help='每种设置的校验次数')
+    args = parser.parse_args()
+    if args.bench:
+        benchmark(args.requests, args.clients)
+    if args.latency:
+        latency_benchmark(args.latency, args.repeat)
@@ -0,0 +1,195 @@
+"""
+电影评分汇总 movie_rating_stats
+评价写入时在同一事务中用 INSERT ... ON DUPLICATE KEY UPDATE 累加增量，详情接口直接关联读取。
+同时维护 movies_top250.community_score：以豆瓣评分为先验的贝叶斯加权平均，
+    (PRIOR_WEIGHT * 豆瓣评分 + 2 * 站内评分总和) / (PRIOR_WEIGHT + 评价数)
+站内评分为 1-5 分，乘 2 换算到豆瓣的 10 分制。评价越多越接近站内均分，评价很少时接近豆瓣评分。
+reconcile 从 movie_reviews 全量重算，用于初始化和修正偏差：python -m app.services.rating_stats
+扣减只更新已有的汇总行；汇总行缺失的电影（如尚未初始化）在事务提交后单独重算，不会产生负数行。
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, event, text
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.rating_stats import MovieRatingStats
+
+STAR_COLUMNS = ("stars_1", "stars_2", "stars_3", "stars_4", "stars_5")
+# 豆瓣评分作为先验时相当于多少条站内评价
+PRIOR_WEIGHT = 10
+# 没有豆瓣评分的电影使用的先验评分（scripts/typed_fields.py 中保持一致）
+DEFAULT_PRIOR_RATING = 6.0
+
+# 会话 info 中记录待重算电影的键
+PENDING_RECONCILE_KEY = "rating_stats_reconcile"
+
+# 社区评分表达式，m 为 movies_top250，s 为 movie_rating_stats（可能为空）
+COMMUNITY_SCORE_SQL = f"""
+    ({PRIOR_WEIGHT} * COALESCE(NULLIF(m.rating, 0), {DEFAULT_PRIOR_RATING}) + 2 * COALESCE(s.rating_sum, 0))
+    / ({PRIOR_WEIGHT} + COALESCE(s.review_count, 0))
+"""
+
+def star_bucket(rating: float) -> int:
+    """评分归入的星级（1-5），与 reconcile 中的 SQL 取整方式一致"""
+    return min(5, max(1, int(rating + 0.5)))
+
+def _delta(old: Optional[float], new: Optional[float]) -> Dict[str, float]:
+    delta = defaultdict(float)
+    for rating, sign in ((old, -1), (new, 1)):
+        if rating is not None:
+            delta["review_count"] += sign
+            delta["rating_sum"] += sign * rating
+            delta[STAR_COLUMNS[star_bucket(rating) - 1]] += sign
+    return delta
+
+def apply_rating_changes(db: Session, changes: Iterable[Tuple[int, Optional[float], Optional[float]]]) -> None:
+    """
+    累加一批评分变化 (电影id, 原评分, 新评分)，None 表示新增或删除。
+    只执行语句不提交，由调用方和评价写入一起提交。
+    """
+    totals: Dict[int, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for movie_id, old, new in changes:
+        for column, value in _delta(old, new).items():
+            totals[movie_id][column] += value
+    rows = [
+        {"movie_id": movie_id, "review_count": int(d["review_count"]), "rating_sum": d["rating_sum"],
+         **{column: int(d[column]) for column in STAR_COLUMNS}}
+        for movie_id, d in totals.items()
+    ]
+    if not rows:
+        return
+    columns = ("review_count", "rating_sum") + STAR_COLUMNS
+    # 只有增量的行可以在汇总行缺失时直接插入；含扣减的行插入会得到负数
+    increments = [row for row in rows if all(row[column] >= 0 for column in columns)]
+    decrements = [row for row in rows if any(row[column] < 0 for column in columns)]
+    if increments:
+        stmt = insert(MovieRatingStats).values(increments)
+        db.execute(stmt.on_duplicate_key_update(**{
+            column: getattr(MovieRatingStats, column) + getattr(stmt.inserted, column)
+            for column in columns
+        }))
+    if decrements:
+        existing = {movie_id for movie_id, in db.query(MovieRatingStats.movie_id)
+                    .filter(MovieRatingStats.movie_id.in_([row["movie_id"] for row in decrements]))}
+        updates = [row for row in decrements if row["movie_id"] in existing]
+        if updates:
+            sets = ", ".join(f"{c} = GREATEST(0, {c} + :{c})" for c in columns)
+            db.execute(text(f"UPDATE movie_rating_stats SET {sets} WHERE movie_id = :movie_id"), updates)
+        missing = [row["movie_id"] for row in decrements if row["movie_id"] not in existing]
+        if missing:
+            db.info.setdefault(PENDING_RECONCILE_KEY, set()).update(missing)
+    update_community_scores(db, list(totals))
+
+def update_community_scores(db: Session, movie_ids: List[int]) -> None:
+    """按汇总重新计算这些电影的社区评分（同一事务内，不提交）"""
+    if not movie_ids:
+        return
+    db.execute(
+        text(f"""
+            UPDATE movies_top250 m
+            LEFT JOIN movie_rating_stats s ON s.movie_id = m.id
+            SET m.community_score = {COMMUNITY_SCORE_SQL}
+            WHERE m.id IN :movie_ids
+        """).bindparams(bindparam("movie_ids", expanding=True)),
+        {"movie_ids": movie_ids}
+    )
+
+def _star_sql(column: str, star: int) -> str:
+    """评分落在该星级时为 1，与 star_bucket 一致"""
+    return f"(LEAST(5, GREATEST(1, FLOOR({column} + 0.5))) = {star})"
+
+def apply_written_review(db: Session, review_id: int, movie_id: int) -> None:
+    """
+    按刚写入的评价行（prev_rating 为覆盖前的评分，新增时为空）在数据库中计算增量并累加，
+    不需要先把原评分读回应用。与评价写入在同一事务中执行，不提交。
+    """
+    stars = ",\n".join(
+        f"{_star_sql('rating', star)} - COALESCE({_star_sql('prev_rating', star)}, 0)"
+        for star in range(1, 6)
+    )
+    columns = ", ".join(STAR_COLUMNS)
+    updates = ", ".join(f"{c} = {c} + VALUES({c})" for c in ("review_count", "rating_sum") + STAR_COLUMNS)
+    db.execute(text(f"""
+        INSERT INTO movie_rating_stats (movie_id, review_count, rating_sum, {columns})
+        SELECT movie_id, prev_rating IS NULL, rating - COALESCE(prev_rating, 0),
+        {stars}
+        FROM movie_reviews
+        WHERE id = :review_id
+        ON DUPLICATE KEY UPDATE {updates}
+    """), {"review_id": review_id})
+    update_community_scores(db, [movie_id])
+
+def apply_rating_change(db: Session, movie_id: int, old: Optional[float], new: Optional[float]) -> None:
+    """累加单条评分变化"""
+    if old != new:
+        apply_rating_changes(db, [(movie_id, old, new)])
+
+def _reconcile_sql(where: str) -> str:
+    stars = ",\n".join(
+        f"SUM(FLOOR(rating + 0.5) {op} {star})"
+        for star, op in ((1, "<="), (2, "="), (3, "="), (4, "="), (5, ">="))
+    )
+    columns = ", ".join(STAR_COLUMNS)
+    updates = ", ".join(f"{c} = VALUES({c})" for c in ("review_count", "rating_sum") + STAR_COLUMNS)
+    return f"""
+        INSERT INTO movie_rating_stats (movie_id, review_count, rating_sum, {columns})
+        SELECT movie_id, COUNT(*), SUM(rating),
+        {stars}
+        FROM movie_reviews
+        WHERE {where}
+        GROUP BY movie_id
+        ON DUPLICATE KEY UPDATE {updates}
+    """
+
+def reconcile_movies(db: Session, movie_ids: List[int]) -> None:
+    """从 movie_reviews 重算这些电影的汇总及社区评分并提交"""
+    db.execute(
+        text(_reconcile_sql("movie_id IN :movie_ids")).bindparams(bindparam("movie_ids", expanding=True)),
+        {"movie_ids": movie_ids}
+    )
+    update_community_scores(db, movie_ids)
+    db.commit()
+
+@event.listens_for(SessionLocal, "after_commit")
+def _reconcile_pending(session: Session) -> None:
+    """扣减时汇总行缺失的电影，在评价变更提交后单独重算"""
+    movie_ids = session.info.pop(PENDING_RECONCILE_KEY, None)
+    if not movie_ids:
+        return
+    db = SessionLocal()
+    try:
+        reconcile_movies(db, list(movie_ids))
+    except Exception as e:
+        print(f"重算评分汇总失败: {str(e)}")
+    finally:
+        db.close()
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(PENDING_RECONCILE_KEY, None)
+
+def reconcile(db: Session) -> None:
+    """从 movie_reviews 全量重算汇总及社区评分；覆盖写入而不是先清空，重算期间详情接口仍有数据"""
+    db.execute(text(_reconcile_sql("movie_id IS NOT NULL")))
+    db.execute(text("""
+        DELETE s FROM movie_rating_stats s
+        LEFT JOIN (SELECT DISTINCT movie_id FROM movie_reviews) r ON r.movie_id = s.movie_id
+        WHERE r.movie_id IS NULL
+    """))
+    db.execute(text(f"""
+        UPDATE movies_top250 m
+        LEFT JOIN movie_rating_stats s ON s.movie_id = m.id
+        SET m.community_score = {COMMUNITY_SCORE_SQL}
+    """))
+    db.commit()
+
+if __name__ == "__main__":
+    session = SessionLocal()
+    try:
+        reconcile(session)
+        print("评分汇总已重算")
+    finally:
+        session.close()
@@ -0,0 +1,196 @@
+"""
+评价写入合并提交
+开启后，提交评价的请求把写入放进队列并等待结果，后台任务每隔几毫秒把队列中的写入合成一个事务：
+一条多行 upsert、一次读回、一次评分汇总更新、一次提交，分摊每次提交的刷盘和加锁开销。
+请求在所在批次提交并失效缓存后才返回，提交者随后的读取能看到自己的评价。
+等待在事件循环中进行，不占用线程池，一批可以合并的写入数不受线程池大小限制。
+等待超时时，尚未开始提交的写入被取消后才返回 503，客户端重试不会重复写入；已在提交的写入继续等待结果。
+批量写入失败时逐条重试，单条错误（如电影不存在）只影响对应的请求。
+
+开启：环境变量 REVIEW_GROUP_COMMIT=1，合并窗口 REVIEW_COMMIT_WINDOW_MS（默认 5 毫秒）
+"""
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.movie import Movie
+from ..utils.periodic import PeriodicTask
+from .review_store import upsert_review, upsert_reviews, review_written
+
+GROUP_COMMIT_ENABLED = os.getenv("REVIEW_GROUP_COMMIT", "0") == "1"
+# 收到第一条写入后等待更多写入的时间（秒）
+COMMIT_WINDOW = float(os.getenv("REVIEW_COMMIT_WINDOW_MS", "5")) / 1000
+# 每批最多写入条数
+MAX_BATCH_SIZE = 500
+# 请求等待写入结果的最长时间（秒）
+WRITE_TIMEOUT = 10
+# 空闲时检查队列的间隔（秒）
+IDLE_POLL = 1.0
+
+class PendingWrite(NamedTuple):
+    user_id: int
+    movie_id: int
+    rating: float
+    content: Optional[str]
+    future: Future
+
+class ReviewWriteQueue:
+    def __init__(self, enabled: bool = GROUP_COMMIT_ENABLED, window: float = COMMIT_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self.queue: "queue.Queue[PendingWrite]" = queue.Queue()
+        self.lock = threading.Lock()
+        self.accepting = False
+        self.batches = 0
+        self.writes = 0
+        # 步骤本身阻塞等待队列（最多 IDLE_POLL 秒），两步之间不再休眠
+        self.task = PeriodicTask(self.step, 0)
+
+    def submit(self, user_id: int, movie_id: int, rating: float, content: Optional[str]) -> Optional[Future]:
+        """放入队列，返回结果为 (评价id, 写入时间, 是否覆盖) 的 Future；队列已停止时返回 None"""
+        future: Future = Future()
+        with self.lock:
+            if not self.accepting:
+                return None
+            self.queue.put(PendingWrite(user_id, movie_id, rating, content, future))
+        return future
+
+    async def wait(self, future: Future) -> Tuple[int, object, bool]:
+        """在事件循环中等待写入结果，超时且写入尚未开始时取消并返回 503"""
+        waiter = asyncio.wrap_future(future)
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter), WRITE_TIMEOUT)
+        except asyncio.TimeoutError:
+            if future.cancel():
+                raise HTTPException(status_code=503, detail="评价写入繁忙，请稍后重试")
+            # 写入已在提交中，等待结果，避免客户端重试造成重复写入
+            return await waiter
+
+    def _collect(self, timeout: float) -> List[PendingWrite]:
+        """取出一批写入：等到第一条后，在合并窗口内继续收集"""
+        try:
+            batch = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.window
+        while len(batch) < MAX_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, db: Session, batch: List[PendingWrite]):
+        """整批在一个事务中写入，返回 (电影id集合, {(用户, 电影): 写入后的行})"""
+        movie_ids = {id_ for (id_,) in db.query(Movie.id)
+                     .filter(Movie.id.in_({w.movie_id for w in batch})).all()}
+        rows = upsert_reviews(db, [
+            {"user_id": w.user_id, "movie_id": w.movie_id, "rating": w.rating, "content": w.content}
+            for w in batch if w.movie_id in movie_ids
+        ])
+        db.commit()
+        return movie_ids, {(row.user_id, row.movie_id): row for row in rows}
+
+    def _write_each(self, db: Session, batch: List[PendingWrite]) -> None:
+        """逐条写入并提交，用于整批失败后的重试"""
+        for w in batch:
+            try:
+                result = upsert_review(db, w.user_id, w.movie_id, w.rating, w.content)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                w.future.set_exception(e)
+                continue
+            review_written(w.user_id, w.movie_id, w.rating)
+            w.future.set_result(result)
+
+    def commit(self, batch: List[PendingWrite]) -> None:
+        db = SessionLocal()
+        try:
+            try:
+                movie_ids, written = self._write_batch(db, batch)
+            except Exception as e:
+                db.rollback()
+                print(f"评价合并提交失败，逐条重试: {str(e)}")
+                self._write_each(db, batch)
+                return
+        finally:
+            db.close()
+
+        # 先更新内存结构再唤醒请求，保证提交者随后的读取能看到新评价
+        for w in batch:
+            if w.movie_id not in movie_ids:
+                w.future.set_exception(HTTPException(status_code=404, detail="电影不存在"))
+                continue
+            row = written[(w.user_id, w.movie_id)]
+            review_written(w.user_id, w.movie_id, w.rating)
+            w.future.set_result((row.id, row.created_at, row.prev_rating is not None))
+        self.batches += 1
+        self.writes += len(batch)
+
+    def step(self, timeout: float = IDLE_POLL) -> int:
+        """收集并提交一批，返回取出的条数"""
+        collected = self._collect(timeout)
+        # 跳过等待超时已取消的写入，其余标记为执行中后不能再取消
+        batch = [w for w in collected if w.future.set_running_or_notify_cancel()]
+        if batch:
+            self.commit(batch)
+        return len(collected)
+
+    def stats(self):
+        return {
+            "enabled": self.accepting,
+            "batches": self.batches,
+            "writes": self.writes,
+            "pending": self.queue.qsize(),
+        }
+
+    def start(self):
+        """在应用启动时开启后台任务，未开启合并提交时不做任何事"""
+        if self.enabled and not self.task.running:
+            with self.lock:
+                self.accepting = True
+            self.task.start()
+
+    async def stop(self):
+        if self.task.running:
+            with self.lock:
+                self.accepting = False
+            # 等待进行中的批次结束（空闲时最多 IDLE_POLL 秒），之后队列只由下面的循环消费
+            await self.task.stop()
+            # 提交队列中剩余的写入
+            while await asyncio.to_thread(self.step, 0):
+                pass
+
+review_queue = ReviewWriteQueue()
+
+def write_review_now(db: Session, user_id: int, movie_id: int, rating: float,
+                     content: Optional[str]) -> Tuple[int, object, bool]:
+    """在当前会话中直接写入并提交"""
+    result = upsert_review(db, user_id, movie_id, rating, content)
+    db.commit()
+    review_written(user_id, movie_id, rating)
+    return result
+
+async def write_review(db: Session, user_id: int, movie_id: int, rating: float,
+                       content: Optional[str]) -> Tuple[int, object, bool]:
+    """写入评价并提交，返回 (评价id, 写入时间, 是否覆盖了已有评价)；开启合并提交时由后台任务批量写入"""
+    if review_queue.accepting:
+        # 等待期间不占用数据库连接
+        await run_in_threadpool(db.close)
+        future = review_queue.submit(user_id, movie_id, rating, content)
+        if future is not None:
+            return await review_queue.wait(future)
+    return await run_in_threadpool(write_review_now, db, user_id, movie_id, rating, content)
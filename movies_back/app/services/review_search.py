@@ -0,0 +1,139 @@
+"""
+评价全文检索
+内容按字符类别切分：中日韩文字取相邻二元组，其他字母数字按整词（过长截断），词项写入 review_terms。
+评价新增、修改、删除时在同一事务中更新词项。
+查询要求包含查询串的全部词项：以第一个词项的倒排表按评价id降序扫描，其余词项按主键逐条探测，
+取满一页即停止，不扫描 movie_reviews；按电影或用户过滤时走 (term, movie_id/user_id, review_id) 索引。
+
+全量重建：python -m app.services.review_search
+"""
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, text
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.orm import Session, aliased
+
+from ..database import SessionLocal
+from ..models.review import MovieReview
+from ..models.review_term import ReviewTerm
+from ..models.user import User
+from ..utils.pagination import encode_cursor, decode_cursor
+
+# 词项最大长度，与 review_terms.term 一致
+MAX_TERM_LENGTH = 32
+# 查询最多使用的词项数，更多的词项对缩小结果帮助不大，只会增加连接
+MAX_QUERY_TERMS = 8
+# 重建时每批处理的评价数
+REBUILD_BATCH_SIZE = 1000
+
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_RUNS = re.compile(rf"([{_CJK}]+)|([^\W_{_CJK}]+)")
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """切分为去重的词项（保持出现顺序），单个字或单个字母不作为词项"""
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKC", text).lower()
+    terms: Dict[str, None] = {}
+    for cjk, word in _RUNS.findall(text):
+        if cjk:
+            for i in range(len(cjk) - 1):
+                terms[cjk[i:i + 2]] = None
+        elif len(word) > 1:
+            terms[word[:MAX_TERM_LENGTH]] = None
+    return list(terms)
+
+def remove_reviews(db: Session, review_ids: Iterable[int]) -> None:
+    """删除评价的词项（不提交）"""
+    review_ids = list(review_ids)
+    for start in range(0, len(review_ids), 1000):
+        db.query(ReviewTerm).filter(ReviewTerm.review_id.in_(review_ids[start:start + 1000]))\
+            .delete(synchronize_session=False)
+
+def index_reviews(db: Session, reviews: Iterable[Tuple[int, int, int, Optional[str]]],
+                  replace: bool = True) -> None:
+    """
+    为 (评价id, 电影id, 用户id, 内容) 重建词项（不提交）。
+    replace 为 False 时不删除旧词项、跳过已存在的词项，用于新增或内容未变的评价。
+    """
+    reviews = list(reviews)
+    if replace:
+        remove_reviews(db, [review_id for review_id, _, _, _ in reviews])
+    rows = [
+        {"term": term, "review_id": review_id, "movie_id": movie_id, "user_id": user_id}
+        for review_id, movie_id, user_id, content in reviews
+        for term in tokenize(content)
+    ]
+    for start in range(0, len(rows), 5000):
+        if replace:
+            db.bulk_insert_mappings(ReviewTerm, rows[start:start + 5000])
+        else:
+            db.execute(insert(ReviewTerm).prefix_with("IGNORE"), rows[start:start + 5000])
+
+def search_reviews(db: Session, keyword: str, limit: int, cursor: Optional[str] = None,
+                   movie_id: Optional[int] = None, user_id: Optional[int] = None) -> Tuple[List[Dict], Optional[str]]:
+    """检索包含关键词的评价（最新在前），返回 (当前页, 下一页游标)"""
+    terms = tokenize(keyword)[:MAX_QUERY_TERMS]
+    if not terms:
+        raise HTTPException(status_code=400, detail="关键词至少包含两个字或一个完整的词")
+
+    driver = aliased(ReviewTerm)
+    query = db.query(driver.review_id).filter(driver.term == terms[0])
+    for term in terms[1:]:
+        other = aliased(ReviewTerm)
+        query = query.join(other, and_(other.term == term, other.review_id == driver.review_id))
+    if movie_id is not None:
+        query = query.filter(driver.movie_id == movie_id)
+    if user_id is not None:
+        query = query.filter(driver.user_id == user_id)
+    if cursor:
+        _, last_id = decode_cursor(cursor)
+        query = query.filter(driver.review_id < last_id)
+    ids = [review_id for (review_id,) in query.order_by(driver.review_id.desc()).limit(limit + 1).all()]
+
+    next_cursor = None
+    if len(ids) > limit:
+        ids = ids[:limit]
+        next_cursor = encode_cursor(None, ids[-1])
+    if not ids:
+        return [], None
+    rows = db.query(
+        MovieReview.id, MovieReview.user_id, MovieReview.movie_id, MovieReview.rating,
+        MovieReview.content, MovieReview.created_at, User.username
+    ).join(User, User.id == MovieReview.user_id)\
+        .filter(MovieReview.id.in_(ids))\
+        .order_by(MovieReview.id.desc()).all()
+    return [row._asdict() for row in rows], next_cursor
+
+def rebuild(db: Session) -> int:
+    """清空并按评价id分批重建全部词项，返回处理的评价数"""
+    db.execute(text("TRUNCATE TABLE review_terms"))
+    last_id, total = 0, 0
+    while True:
+        batch = db.query(MovieReview.id, MovieReview.movie_id, MovieReview.user_id, MovieReview.content)\
+            .filter(MovieReview.id > last_id)\
+            .order_by(MovieReview.id).limit(REBUILD_BATCH_SIZE).all()
+        if not batch:
+            return total
+        rows = [
+            {"term": term, "review_id": review_id, "movie_id": movie_id, "user_id": user_id}
+            for review_id, movie_id, user_id, content in batch
+            for term in tokenize(content)
+        ]
+        if rows:
+            # 重建期间新写入的评价可能已建立词项
+            db.execute(insert(ReviewTerm).prefix_with("IGNORE"), rows)
+        db.commit()
+        last_id = batch[-1].id
+        total += len(batch)
+
+if __name__ == "__main__":
+    session = SessionLocal()
+    try:
+        count = rebuild(session)
+        print(f"评价全文索引已重建: {count} 条评价")
+    finally:
+        session.close()
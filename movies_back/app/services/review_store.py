@@ -0,0 +1,140 @@
+"""
+评价写入
+(user_id, movie_id) 上有唯一约束，写入用一条 INSERT ... ON DUPLICATE KEY UPDATE 完成新增或覆盖，
+并发的重复提交只会落到同一行。覆盖时先把原评分记入 prev_rating（赋值从左到右执行），created_at 记为本次写入时间。
+单条写入通过 id = LAST_INSERT_ID(id) 取得评价id、由受影响行数判断是否覆盖，不再读回；
+评分汇总、用户汇总由数据库按这一行的 prev_rating/rating 直接计算增量。
+批量写入按唯一索引读回各行（已被本事务锁定），在应用中合并增量。
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.movie import Movie
+from ..models.review import MovieReview
+from ..models.user import User
+from .collaborative import item_cf
+from .detail_cache import movie_detail_cache
+from . import rating_stats, user_reviews
+from .rating_stats import apply_rating_changes
+from .review_search import index_reviews, remove_reviews
+from .trending import trending
+from .user_reviews import apply_user_changes
+
+def apply_review_changes(db: Session,
+                         changes: List[Tuple[int, int, Optional[float], Optional[float]]]) -> None:
+    """累加一批评价变化 (用户id, 电影id, 原评分, 新评分) 到电影和用户的汇总，不提交"""
+    changes = [change for change in changes if change[2] != change[3]]
+    apply_rating_changes(db, [(movie_id, old, new) for _, movie_id, old, new in changes])
+    apply_user_changes(db, changes)
+
+def apply_review_change(db: Session, user_id: int, movie_id: int,
+                        old: Optional[float], new: Optional[float]) -> None:
+    """累加单条评价变化"""
+    apply_review_changes(db, [(user_id, movie_id, old, new)])
+
+def _upsert(db: Session, rows: List[Dict]):
+    stmt = insert(MovieReview).values([{**row, "prev_rating": None, "created_at": func.now()} for row in rows])
+    return db.execute(stmt.on_duplicate_key_update([
+        ("prev_rating", MovieReview.rating),
+        ("rating", stmt.inserted.rating),
+        ("content", stmt.inserted.content),
+        ("created_at", stmt.inserted.created_at),
+        # 覆盖时也让 lastrowid 返回这一行的id
+        ("id", func.last_insert_id(MovieReview.id)),
+    ]))
+
+def upsert_review(db: Session, user_id: int, movie_id: int, rating: float,
+                  content: Optional[str]) -> Tuple[int, datetime, bool]:
+    """
+    新增或覆盖用户对电影的评价并更新评分汇总，返回 (评价id, 写入时间, 是否覆盖了已有评价)。
+    不提交，由调用方提交。
+    """
+    try:
+        result = _upsert(db, [{"user_id": user_id, "movie_id": movie_id, "rating": rating, "content": content}])
+    except IntegrityError:
+        # 外键约束失败时查明是哪一方不存在，其他约束错误原样抛出
+        db.rollback()
+        if db.query(Movie.id).filter(Movie.id == movie_id).first() is None:
+            raise HTTPException(status_code=404, detail="电影不存在")
+        # 用户已被删除，但其他进程的认证缓存中仍有记录
+        if db.query(User.id).filter(User.id == user_id).first() is None:
+            raise HTTPException(status_code=400, detail="用户不存在")
+        raise
+    review_id = result.lastrowid
+    # 受影响行数：新增为 1，覆盖为 2；内容完全相同的重复提交也为 1（汇总增量为零，词项不变）
+    updated = result.rowcount == 2
+    rating_stats.apply_written_review(db, review_id, movie_id)
+    user_reviews.apply_written_review(db, review_id)
+    index_reviews(db, [(review_id, movie_id, user_id, content)], replace=updated)
+    return review_id, datetime.now().replace(microsecond=0), updated
+
+def upsert_reviews(db: Session, rows: List[Dict]) -> List:
+    """
+    批量新增或覆盖评价，rows 为 {user_id, movie_id, rating, content}，同一 (用户, 电影) 以最后一条为准。
+    返回写入后的行（id, user_id, movie_id, created_at, prev_rating, rating）。不提交。
+    """
+    latest = {(row["user_id"], row["movie_id"]): row for row in rows}
+    if not latest:
+        return []
+    _upsert(db, list(latest.values()))
+    written = db.query(MovieReview.id, MovieReview.user_id, MovieReview.movie_id, MovieReview.created_at,
+                       MovieReview.prev_rating, MovieReview.rating)\
+        .filter(tuple_(MovieReview.user_id, MovieReview.movie_id).in_(list(latest))).all()
+    apply_review_changes(db, [(row.user_id, row.movie_id, row.prev_rating, row.rating) for row in written])
+    index_reviews(db, [(row.id, row.movie_id, row.user_id, latest[(row.user_id, row.movie_id)]["content"])
+                       for row in written])
+    return written
+
+def delete_review_row(db: Session, review: MovieReview) -> None:
+    """删除评价并扣减汇总、清除全文索引词项。不提交"""
+    apply_review_change(db, review.user_id, review.movie_id, review.rating, None)
+    remove_reviews(db, [review.id])
+    db.delete(review)
+
+def review_written(user_id: int, movie_id: int, rating: Optional[float]) -> None:
+    """评价提交后更新各内存结构，rating 为 None 表示评价被删除"""
+    movie_detail_cache.invalidate(movie_id)
+    if rating is not None:
+        trending.record_review(movie_id)
+    item_cf.record(user_id, movie_id, rating)
+
+def import_batch(rows: List[Dict]) -> Tuple[int, List[str]]:
+    """
+    导入一批评价，跳过不存在的用户或电影，返回 (写入条数, 错误信息)。
+    使用独立会话，供流式导入在线程池中调用。
+    """
+    db = SessionLocal()
+    try:
+        movie_ids = {id_ for (id_,) in db.query(Movie.id)
+                     .filter(Movie.id.in_({row["movie_id"] for row in rows})).all()}
+        user_ids = {id_ for (id_,) in db.query(User.id)
+                    .filter(User.id.in_({row["user_id"] for row in rows})).all()}
+        valid, errors = [], []
+        for row in rows:
+            if row["movie_id"] not in movie_ids:
+                errors.append(f"第{row['line']}行: 电影 {row['movie_id']} 不存在")
+            elif row["user_id"] not in user_ids:
+                errors.append(f"第{row['line']}行: 用户 {row['user_id']} 不存在")
+            else:
+                valid.append({k: row[k] for k in ("user_id", "movie_id", "rating", "content")})
+        written = upsert_reviews(db, valid)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    # 导入的是历史评价，不计入热度
+    for row in written:
+        if row.prev_rating != row.rating:
+            movie_detail_cache.invalidate(row.movie_id)
+            item_cf.record(row.user_id, row.movie_id, row.rating)
+    return len(valid), errors
@@ -0,0 +1,174 @@
+import random
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.movie import Movie
+from ..utils.fields import load_movies
+from ..utils.periodic import PeriodicTask
+from ..utils.tags import split_tags, normalize_tag
+
+# 候选池刷新间隔（秒），爬虫写入后最多延迟这么久生效
+REFRESH_INTERVAL = 300
+# 后台任务检查是否需要刷新的间隔（秒）
+STALE_CHECK_INTERVAL = 5
+# 多条件过滤时拒绝采样的最大尝试倍数，超过后退化为完整过滤
+MAX_REJECTION_FACTOR = 20
+
+class MovieSampler:
+    """
+    随机推荐采样器。
+    进程内保存紧凑的候选id池，按标签/年份/评分建立位置索引，
+    每次推荐只需 O(k) 次随机抽取，再按主键取回电影。
+    候选池由后台任务刷新，请求只在尚未加载过时同步加载一次。
+    """
+
+    def __init__(self, refresh_interval: int = REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self.loaded_at = 0.0
+        self.stale = True
+        # 以下数组按位置对齐
+        self.ids = array('i')
+        self.years = array('i')      # 无年份记为0
+        self.ratings = array('d')    # 无评分记为0
+        self.movie_tags: List[tuple] = []
+        # 过滤用的位置索引
+        self.tag_positions: Dict[str, array] = {}
+        self.year_positions: Dict[int, array] = {}
+        self.rating_order = array('i')      # 按评分升序排列的位置
+        self.sorted_ratings = array('d')    # 与 rating_order 对齐的评分
+        self.task = PeriodicTask(self.refresh, STALE_CHECK_INTERVAL)
+
+    def mark_stale(self):
+        """电影目录变化后调用，后台任务会尽快重建候选池"""
+        self.stale = True
+
+    def _load(self, db: Session):
+        # 先清除标记，加载期间再次收到的变化通知会触发下一次刷新
+        self.stale = False
+        self._rebuild(db.query(Movie.id, Movie.tags, Movie.release_year, Movie.rating).all())
+
+    def ensure_fresh(self, db: Session):
+        """只在候选池从未加载过时（后台任务尚未完成首次加载）同步加载"""
+        if self.loaded_at:
+            return
+        with self.lock:
+            if not self.loaded_at:
+                self._load(db)
+
+    def refresh(self) -> None:
+        """候选池过期时在独立会话中重建，由后台任务调用"""
+        if not self.stale and time.monotonic() - self.loaded_at < self.refresh_interval:
+            return
+        db = SessionLocal()
+        try:
+            with self.lock:
+                self._load(db)
+        except Exception as e:
+            self.stale = True
+            print(f"刷新推荐候选池失败: {str(e)}")
+        finally:
+            db.close()
+
+    def _rebuild(self, rows):
+        ids, years, ratings = array('i'), array('i'), array('d')
+        movie_tags = []
+        tag_positions: Dict[str, array] = {}
+        year_positions: Dict[int, array] = {}
+
+        for position, (movie_id, tags, year, rating) in enumerate(rows):
+            year = year or 0
+            ids.append(movie_id)
+            years.append(year)
+            ratings.append(rating or 0.0)
+            tag_list = tuple(split_tags(tags))
+            movie_tags.append(tag_list)
+            for tag in tag_list:
+                tag_positions.setdefault(tag, array('i')).append(position)
+            if year:
+                year_positions.setdefault(year, array('i')).append(position)
+
+        rating_order = array('i', sorted(range(len(ids)), key=ratings.__getitem__))
+
+        self.ids, self.years, self.ratings = ids, years, ratings
+        self.movie_tags = movie_tags
+        self.tag_positions = tag_positions
+        self.year_positions = year_positions
+        self.rating_order = rating_order
+        self.sorted_ratings = array('d', (ratings[p] for p in rating_order))
+        self.loaded_at = time.monotonic()
+
+    def _candidates(self, tag: Optional[str], year: Optional[int], min_rating: Optional[float]):
+        """返回最小的候选位置集合，以及仍需逐个检查的条件"""
+        candidates = []
+        if tag is not None:
+            candidates.append(('tag', self.tag_positions.get(tag, array('i'))))
+        if year is not None:
+            candidates.append(('year', self.year_positions.get(year, array('i'))))
+        if min_rating is not None:
+            # 评分有序，二分得到满足条件的后缀区间；memoryview 切片不复制数组
+            start = bisect_left(self.sorted_ratings, min_rating)
+            candidates.append(('rating', memoryview(self.rating_order)[start:]))
+        if not candidates:
+            return range(len(self.ids)), set()
+        name, positions = min(candidates, key=lambda item: len(item[1]))
+        return positions, {c[0] for c in candidates} - {name}
+
+    def _matches(self, position: int, checks, tag, year, min_rating) -> bool:
+        if 'tag' in checks and tag not in self.movie_tags[position]:
+            return False
+        if 'year' in checks and self.years[position] != year:
+            return False
+        if 'rating' in checks and self.ratings[position] < min_rating:
+            return False
+        return True
+
+    def sample_ids(self, k: int, tag: Optional[str] = None, year: Optional[int] = None,
+                   min_rating: Optional[float] = None) -> List[int]:
+        """随机抽取至多k个满足条件的电影id"""
+        positions, checks = self._candidates(tag, year, min_rating)
+        if not checks:
+            picked = random.sample(positions, min(k, len(positions)))
+            return [self.ids[p] for p in picked]
+
+        # 在最小集合上拒绝采样，其余条件逐个校验
+        picked, seen = [], set()
+        attempts = k * MAX_REJECTION_FACTOR
+        while len(picked) < k and attempts > 0 and len(seen) < len(positions):
+            attempts -= 1
+            position = positions[random.randrange(len(positions))]
+            if position in seen:
+                continue
+            seen.add(position)
+            if self._matches(position, checks, tag, year, min_rating):
+                picked.append(position)
+
+        if len(picked) < k and len(seen) < len(positions):
+            # 条件过于稀疏，退化为一次完整过滤
+            remaining = [p for p in positions
+                         if p not in seen and self._matches(p, checks, tag, year, min_rating)]
+            picked.extend(random.sample(remaining, min(k - len(picked), len(remaining))))
+        return [self.ids[p] for p in picked]
+
+    def sample(self, db: Session, k: int, tag: Optional[str] = None, year: Optional[int] = None,
+               min_rating: Optional[float] = None, fields: Optional[List[str]] = None) -> List:
+        """随机推荐k部电影，按主键批量取回（fields 指定时只查询这些列）"""
+        self.ensure_fresh(db)
+        if tag is not None:
+            tag = normalize_tag(tag)
+        return load_movies(db, self.sample_ids(k, tag, year, min_rating), fields)
+
+    def start(self):
+        """在应用启动时开启后台刷新，首次运行即预热候选池"""
+        self.task.start()
+
+    async def stop(self):
+        await self.task.stop()
+
+movie_sampler = MovieSampler()
@@ -0,0 +1,250 @@
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.movie import Movie
+from ..utils.fields import load_movies
+
+# 各字段的相关度权重
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'director_description': 1.5,
+    'leader': 1.5,
+    'tags': 1.0,
+}
+# 标题完全匹配、前缀匹配的额外加分
+EXACT_TITLE_BONUS = 3.0
+PREFIX_TITLE_BONUS = 1.5
+# 豆瓣评分在最终排序中的权重（评分按10分制归一化）
+RATING_WEIGHT = 1.0
+
+# 增量同步新电影的间隔、全量重建（覆盖爬虫对已有记录的修改）的间隔（秒）
+SYNC_INTERVAL = 30
+REBUILD_INTERVAL = 3600
+# 热门查询缓存大小
+QUERY_CACHE_SIZE = 1024
+# 二元组没有共同命中时，按命中的二元组数取前这么多部再精确计分
+MAX_FALLBACK_CANDIDATES = 500
+# 请求等待启动预热完成的最长时间（秒），超时后自行加载
+WARM_WAIT_TIMEOUT = 30
+
+_STRIP_CHARS = re.compile(r"[\s\W_]+", re.UNICODE)
+
+def normalize(text: Optional[str]) -> str:
+    """全角转半角、转小写，去掉空白和标点"""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKC', text).lower()
+    return _STRIP_CHARS.sub('', text)
+
+def ngrams(text: str) -> Set[str]:
+    """字符二元组；单字文本退化为单字，中文标题无需分词"""
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+class SearchIndex:
+    """
+    电影搜索倒排索引。
+    以字符二元组为词项覆盖标题、主演、导演和标签，另建单字索引支持单字查询，
+    结果按字段相关度与豆瓣评分混合排序，并对归一化后的热门查询做LRU缓存。
+    每部电影各字段的二元组在建索引时算好，计分时不再重新切分。
+    """
+
+    def __init__(self, cache_size: int = QUERY_CACHE_SIZE):
+        self.lock = threading.RLock()
+        self.postings: Dict[str, Set[int]] = {}
+        self.unigrams: Dict[str, Set[int]] = {}
+        # 电影id -> (各字段规范化文本, 评分, 各字段的二元组)
+        self.docs: Dict[int, Tuple[Dict[str, str], float, Dict[str, Set[str]]]] = {}
+        self.max_id = 0
+        self.synced_at = 0.0
+        self.rebuilt_at = 0.0
+        self.rebuilding = False
+        # 首次全量加载结束（成功或失败）后置位，供等待启动预热的请求使用
+        self.loaded = threading.Event()
+        # 已有电影被修改或删除，需要全量重建
+        self.stale = False
+        self.cache: "OrderedDict[str, List[int]]" = OrderedDict()
+        self.cache_size = cache_size
+
+    def _doc_grams(self, fields: Dict[str, str],
+                   field_grams: Dict[str, Set[str]]) -> Tuple[Set[str], Set[str]]:
+        chars = set()
+        for text in fields.values():
+            chars |= set(text)
+        return set().union(*field_grams.values()), chars
+
+    def _add(self, postings, unigrams, docs, movie) -> None:
+        fields = {name: normalize(getattr(movie, name)) for name in FIELD_WEIGHTS}
+        field_grams = {name: ngrams(text) for name, text in fields.items()}
+        grams, chars = self._doc_grams(fields, field_grams)
+        for gram in grams:
+            postings.setdefault(gram, set()).add(movie.id)
+        for char in chars:
+            unigrams.setdefault(char, set()).add(movie.id)
+        docs[movie.id] = (fields, movie.rating or 0.0, field_grams)
+
+    def upsert(self, movie) -> None:
+        """新增或更新一部电影的索引"""
+        with self.lock:
+            self._remove(movie.id)
+            self._add(self.postings, self.unigrams, self.docs, movie)
+            self.max_id = max(self.max_id, movie.id)
+            self.cache.clear()
+
+    def remove(self, movie_id: int) -> None:
+        """从索引中删除一部电影"""
+        with self.lock:
+            self._remove(movie_id)
+            self.cache.clear()
+
+    def _remove(self, movie_id: int) -> None:
+        doc = self.docs.pop(movie_id, None)
+        if doc is None:
+            return
+        grams, chars = self._doc_grams(doc[0], doc[2])
+        for table, keys in ((self.postings, grams), (self.unigrams, chars)):
+            for key in keys:
+                ids = table.get(key)
+                if ids is not None:
+                    ids.discard(movie_id)
+                    if not ids:
+                        del table[key]
+
+    def _columns(self):
+        return [Movie.id, Movie.rating] + [getattr(Movie, name) for name in FIELD_WEIGHTS]
+
+    def mark_stale(self) -> None:
+        """电影数据被修改或删除时调用，下次搜索时在后台全量重建"""
+        self.stale = True
+
+    def _sync_due(self, now: float) -> bool:
+        return now - self.synced_at >= SYNC_INTERVAL or (self.stale and not self.rebuilding)
+
+    def start(self) -> None:
+        """应用启动时在后台线程预热索引，首个搜索请求不必同步构建"""
+        with self.lock:
+            if self.rebuilt_at or self.rebuilding:
+                return
+            self.rebuilding = True
+        threading.Thread(target=self._background_rebuild, daemon=True).start()
+
+    def ensure_fresh(self, db: Session) -> None:
+        """按间隔增量加载新电影；定期或收到修改通知后在后台线程全量重建，期间继续使用旧索引"""
+        if not self.rebuilt_at and self.rebuilding:
+            # 启动预热尚未完成时等它的结果，不重复加载（等待时不能持有 self.lock）
+            self.loaded.wait(WARM_WAIT_TIMEOUT)
+        now = time.monotonic()
+        if not self._sync_due(now):
+            return
+        with self.lock:
+            if not self._sync_due(now):
+                return
+            self.synced_at = now
+            if not self.rebuilt_at:
+                # 首次加载只能同步完成
+                self.stale = False
+                self.rebuild(db.query(*self._columns()).all())
+                return
+            if (self.stale or now - self.rebuilt_at >= REBUILD_INTERVAL) and not self.rebuilding:
+                # 重建期间再次收到通知时 stale 重新置位，重建完成后再来一次
+                self.stale = False
+                self.rebuilding = True
+                threading.Thread(target=self._background_rebuild, daemon=True).start()
+            for row in db.query(*self._columns()).filter(Movie.id > self.max_id).all():
+                self.upsert(row)
+
+    def _background_rebuild(self) -> None:
+        db = SessionLocal()
+        try:
+            self.rebuild(db.query(*self._columns()).all())
+        except Exception as e:
+            self.stale = True
+            print(f"重建搜索索引失败: {str(e)}")
+        finally:
+            self.rebuilding = False
+            # 预热失败也要唤醒等待的请求，由它们自行同步加载
+            self.loaded.set()
+            db.close()
+
+    def rebuild(self, rows) -> None:
+        """用给定的电影记录全量重建索引，构建完成后整体替换"""
+        postings, unigrams, docs = {}, {}, {}
+        for row in rows:
+            self._add(postings, unigrams, docs, row)
+        with self.lock:
+            self.postings, self.unigrams, self.docs = postings, unigrams, docs
+            self.max_id = max(docs, default=0)
+            self.cache.clear()
+            self.rebuilt_at = self.synced_at = time.monotonic()
+        self.loaded.set()
+
+    def _score(self, movie_id: int, query: str, grams: Set[str]) -> float:
+        fields, rating, field_grams = self.docs[movie_id]
+        score = 0.0
+        for name, weight in FIELD_WEIGHTS.items():
+            text = fields[name]
+            if not text:
+                continue
+            if query in text:
+                score += weight
+            elif grams:
+                # 部分匹配按命中二元组比例计分
+                score += weight * len(grams & field_grams[name]) / len(grams)
+        title = fields['title']
+        if title == query:
+            score += EXACT_TITLE_BONUS
+        elif title.startswith(query):
+            score += PREFIX_TITLE_BONUS
+        return score + RATING_WEIGHT * rating / 10
+
+    def search_ids(self, keyword: str, limit: int) -> List[int]:
+        """返回按相关度排序的电影id"""
+        query = normalize(keyword)
+        if not query:
+            return []
+        cache_key = f"{query}:{limit}"
+        with self.lock:
+            if cache_key in self.cache:
+                self.cache.move_to_end(cache_key)
+                return self.cache[cache_key]
+
+            if len(query) == 1:
+                grams = set()
+                candidates = set(self.unigrams.get(query, ()))
+            else:
+                grams = ngrams(query)
+                lists = sorted((self.postings.get(g, set()) for g in grams), key=len)
+                candidates = set(lists[0]).intersection(*lists[1:]) if lists else set()
+                if not candidates:
+                    # 没有完全命中时退化为任一二元组命中：先按命中的二元组数取前若干部，
+                    # 避免常见二元组把大部分电影都带进精确计分
+                    hits = Counter()
+                    for ids in lists:
+                        hits.update(ids)
+                    candidates = {mid for mid, _ in hits.most_common(MAX_FALLBACK_CANDIDATES)}
+
+            scored = heapq.nlargest(
+                limit, ((self._score(mid, query, grams), mid) for mid in candidates)
+            )
+            result = [mid for _, mid in scored]
+
+            self.cache[cache_key] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            return result
+
+    def search(self, db: Session, keyword: str, limit: int, fields: Optional[List[str]] = None) -> List:
+        """搜索电影并按主键取回（fields 指定时只查询这些列）"""
+        self.ensure_fresh(db)
+        return load_movies(db, self.search_ids(keyword, limit), fields)
+
+search_index = SearchIndex()
@@ -0,0 +1,253 @@
+"""
+相似电影索引
+把标签、国家、导演、主演向量化为稀疏矩阵（TF-IDF 加权，行归一化后内积即余弦相似度），
+为每部电影计算前 TOP_K 个邻居写入 movie_similarities，接口只需按主键读取。
+每部电影保存参与计算字段的摘要，只有元数据变化的电影重新计算邻居，其他电影把变化电影合并进已有列表；
+全量重建按 FULL_REFRESH_INTERVAL 单独执行。
+
+全量重建：python -m app.services.similarity --full
+"""
+import hashlib
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.movie import Movie
+from ..models.similarity import MovieSimilarity, MovieFeatureHash
+from ..utils.fields import movie_query
+from ..utils.periodic import PeriodicTask
+from ..utils.tags import split_names, split_tags
+
+# 每部电影保存的邻居数量
+TOP_K = 20
+# 各字段的权重，导演相同比国家相同更能说明相似
+FIELD_WEIGHTS = {
+    "tag": 1.0,
+    "country": 0.5,
+    "director": 1.5,
+    "leader": 1.0,
+}
+# 后台检查元数据变化的间隔（秒）；收到失效通知后提前检查
+REFRESH_INTERVAL = 3600
+STALE_CHECK_INTERVAL = 30
+# 全量重建的间隔（秒），修正增量合并累积的偏差
+FULL_REFRESH_INTERVAL = 86400
+# 变化电影超过该比例时直接全量重建
+FULL_REFRESH_RATIO = 0.25
+# 一次计算的行数，控制稠密相似度块的内存
+BLOCK_SIZE = 256
+
+def movie_features(row) -> List[str]:
+    """电影的特征项，形如 "tag:剧情" """
+    features = [f"tag:{t}" for t in split_tags(row.tags)]
+    features += [f"country:{c}" for c in split_tags(row.country)]
+    features += [f"director:{d}" for d in split_names(row.director_description)]
+    features += [f"leader:{a}" for a in split_names(row.leader)]
+    return list(dict.fromkeys(features))
+
+def feature_hash(row) -> str:
+    raw = "\x1f".join(str(getattr(row, name) or '') for name in ("tags", "country", "director_description", "leader"))
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+class SimilarityIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stale = True
+        self.refreshed_at = 0.0
+        # 启动时按摘要增量检查，从未计算过的电影都视为变化
+        self.full_refreshed_at = time.monotonic()
+        self.task = PeriodicTask(self._check, STALE_CHECK_INTERVAL)
+
+    def mark_stale(self) -> None:
+        """电影数据有变化时调用，后台任务会尽快检查并重算"""
+        self.stale = True
+
+    def build_matrix(self, rows) -> sparse.csr_matrix:
+        """构造行归一化的 TF-IDF 稀疏矩阵，行顺序与 rows 一致"""
+        vocab: Dict[str, int] = {}
+        indptr, indices = [0], []
+        for row in rows:
+            for feature in movie_features(row):
+                indices.append(vocab.setdefault(feature, len(vocab)))
+            indptr.append(len(indices))
+        weights = np.array([FIELD_WEIGHTS[f.split(':', 1)[0]] for f in vocab], dtype=np.float32) \
+            if vocab else np.zeros(0, dtype=np.float32)
+        matrix = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr)),
+            shape=(len(rows), len(vocab)),
+        )
+        # 出现越少的特征越有区分度
+        df = np.bincount(matrix.indices, minlength=len(vocab))
+        idf = np.log((1 + len(rows)) / (1 + df)).astype(np.float32) + 1
+        matrix = matrix @ sparse.diags(weights * idf)
+        norms = np.sqrt(matrix.multiply(matrix).sum(axis=1)).A1
+        norms[norms == 0] = 1
+        return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+
+    def score_blocks(self, matrix: sparse.csr_matrix, positions: np.ndarray):
+        """按块计算指定行与全部电影的相似度，逐块返回 (行号数组, 稠密分数)，自身的分数为 -1"""
+        transposed = matrix.T.tocsc()
+        for start in range(0, len(positions), BLOCK_SIZE):
+            block = positions[start:start + BLOCK_SIZE]
+            scores = (matrix[block] @ transposed).toarray()
+            scores[np.arange(len(block)), block] = -1  # 排除自身
+            yield block, scores
+
+    @staticmethod
+    def best(scores: np.ndarray, k: int = TOP_K) -> List[Tuple[int, float]]:
+        """一行分数中前 k 个正分数，返回 [(行号, 分数), ...]，分数降序"""
+        k = min(k, len(scores) - 1)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(c), float(scores[c])) for c in top if scores[c] > 0]
+
+    def stored_neighbours(self, db: Session, movie_ids: Set[int]) -> Dict[int, List[Tuple[int, float]]]:
+        """读取已保存的邻居列表，按 seq 排序"""
+        stored: Dict[int, List[Tuple[int, float]]] = defaultdict(list)
+        movie_ids = sorted(movie_ids)
+        for start in range(0, len(movie_ids), 1000):
+            for movie_id, similar_id, score in db.query(
+                MovieSimilarity.movie_id, MovieSimilarity.similar_id, MovieSimilarity.score
+            ).filter(MovieSimilarity.movie_id.in_(movie_ids[start:start + 1000]))\
+                    .order_by(MovieSimilarity.movie_id, MovieSimilarity.seq).all():
+                stored[movie_id].append((similar_id, score))
+        return stored
+
+    def refresh(self, db: Session, full: bool = False) -> int:
+        """
+        增量更新：只有元数据变化的电影整行重算邻居；其他电影保留已保存的列表，
+        去掉指向变化或已删除电影的邻居，再合并与变化电影的新分数，超过第 k 名时才进入列表。
+        其他电影之间的分数不重算（IDF 的漂移、被去掉后空出的名次由定期全量重建修正）。
+        返回邻居列表有变化的电影数。
+        """
+        rows = db.query(Movie.id, Movie.tags, Movie.country, Movie.director_description, Movie.leader)\
+            .order_by(Movie.id).all()
+        ids = np.array([row.id for row in rows], dtype=np.int64)
+        hashes = {row.id: feature_hash(row) for row in rows}
+        stored_hashes = dict(db.query(MovieFeatureHash.movie_id, MovieFeatureHash.feature_hash).all())
+
+        deleted = set(stored_hashes) - set(hashes)
+        changed = {i for i, h in hashes.items() if stored_hashes.get(i) != h}
+        # 变化的电影占比过大时增量合并不再划算
+        if full or len(changed) > len(hashes) * FULL_REFRESH_RATIO:
+            full, changed = True, set(hashes)
+        if not changed and not deleted:
+            return 0
+
+        # 特征矩阵的构造与电影数线性相关，相似度只计算变化电影所在的行
+        matrix = self.build_matrix(rows)
+        position = {int(movie_id): p for p, movie_id in enumerate(ids)}
+        changed_positions = np.array(sorted(position[i] for i in changed), dtype=np.int64)
+        neighbours: Dict[int, List[Tuple[int, float]]] = {}
+        # 其他电影与变化电影的新分数，每块只保留前 TOP_K 个
+        candidates: Dict[int, List[Tuple[int, float]]] = defaultdict(list)
+        for block, scores in self.score_blocks(matrix, changed_positions):
+            for i, p in enumerate(block):
+                neighbours[int(ids[p])] = [(int(ids[c]), score) for c, score in self.best(scores[i])]
+            if full:
+                continue
+            for c in np.flatnonzero((scores > 0).any(axis=0)):
+                other = int(ids[c])
+                if other in changed:
+                    continue
+                column = scores[:, c]
+                hits = np.flatnonzero(column > 0)
+                if len(hits) > TOP_K:
+                    hits = hits[np.argpartition(-column[hits], TOP_K - 1)[:TOP_K]]
+                candidates[other].extend((int(ids[block[r]]), float(column[r])) for r in hits)
+
+        if not full:
+            touched = changed | deleted
+            referencing = {
+                movie_id for (movie_id,) in db.query(MovieSimilarity.movie_id)
+                .filter(MovieSimilarity.similar_id.in_(touched)).distinct().all()
+                if movie_id in position and movie_id not in changed
+            }
+            stored = self.stored_neighbours(db, set(candidates) | referencing)
+            for movie_id in set(candidates) | referencing:
+                old = stored.get(movie_id, [])
+                kept = [(similar_id, score) for similar_id, score in old if similar_id not in touched]
+                merged = sorted(kept + candidates.get(movie_id, []), key=lambda item: -item[1])[:TOP_K]
+                if merged != old:
+                    neighbours[movie_id] = merged
+
+        stale_ids = list(neighbours) + list(deleted)
+        for start in range(0, len(stale_ids), 1000):
+            chunk = stale_ids[start:start + 1000]
+            db.query(MovieSimilarity).filter(MovieSimilarity.movie_id.in_(chunk))\
+                .delete(synchronize_session=False)
+        db.bulk_insert_mappings(MovieSimilarity, [
+            {"movie_id": movie_id, "seq": seq, "similar_id": similar_id, "score": score}
+            for movie_id, items in neighbours.items()
+            for seq, (similar_id, score) in enumerate(items)
+        ])
+        hash_ids = list(changed | deleted)
+        for start in range(0, len(hash_ids), 1000):
+            chunk = hash_ids[start:start + 1000]
+            db.query(MovieFeatureHash).filter(MovieFeatureHash.movie_id.in_(chunk))\
+                .delete(synchronize_session=False)
+        db.bulk_insert_mappings(MovieFeatureHash, [
+            {"movie_id": movie_id, "feature_hash": hashes[movie_id]} for movie_id in changed
+        ])
+        db.commit()
+        return len(neighbours)
+
+    def refresh_in_background(self, full: bool = False) -> None:
+        """在独立会话中执行一次增量计算，同一时间只运行一个"""
+        if not self.lock.acquire(blocking=False):
+            return
+        db = SessionLocal()
+        try:
+            self.stale = False
+            count = self.refresh(db, full)
+            if full:
+                self.full_refreshed_at = time.monotonic()
+            if count:
+                print(f"相似电影已更新: {count} 部")
+        except Exception as e:
+            db.rollback()
+            self.stale = True
+            print(f"更新相似电影失败: {str(e)}")
+        finally:
+            self.refreshed_at = time.monotonic()
+            db.close()
+            self.lock.release()
+
+    def similar(self, db: Session, movie_id: int, limit: int, fields: Optional[List[str]] = None) -> List:
+        """按预计算结果返回相似电影"""
+        return movie_query(db, fields)\
+            .join(MovieSimilarity, MovieSimilarity.similar_id == Movie.id)\
+            .filter(MovieSimilarity.movie_id == movie_id)\
+            .order_by(MovieSimilarity.seq)\
+            .limit(limit).all()
+
+    def _check(self):
+        if time.monotonic() - self.full_refreshed_at >= FULL_REFRESH_INTERVAL:
+            self.refresh_in_background(True)
+        elif self.stale or time.monotonic() - self.refreshed_at >= REFRESH_INTERVAL:
+            self.refresh_in_background()
+
+    def start(self):
+        """在应用启动时开启后台任务"""
+        self.task.start()
+
+    async def stop(self):
+        await self.task.stop()
+
+similarity_index = SimilarityIndex()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="计算相似电影")
+    parser.add_argument('--full', action='store_true', help='忽略摘要，全部重算')
+    args = parser.parse_args()
+    similarity_index.refresh_in_background(full=args.full)
@@ -0,0 +1,175 @@
+"""
+搜索框联想
+把片名、导演、主演（以及它们的全拼和拼音首字母）规范化后放入一个有序数组，
+前缀查询用二分查找定位区间，再按热度取前几部电影，全部在内存中完成。
+新增电影定期增量合并进有序数组；收到失效通知或到达重建间隔时在后台全量重建。
+"""
+import heapq
+import math
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.movie import Movie
+from ..utils.periodic import PeriodicTask
+from ..utils.tags import split_names
+from .search_index import normalize
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:  # 未安装 pypinyin 时只按原文匹配
+    lazy_pinyin = None
+
+# 匹配字段及其加权，片名匹配优先于导演、主演
+FIELDS = ("title", "director", "leader")
+FIELD_BONUS = (2.0, 1.0, 0.5)
+# 增量同步、全量重建的间隔（秒）
+SYNC_INTERVAL = 30
+REBUILD_INTERVAL = 3600
+# 查询结果缓存
+QUERY_CACHE_SIZE = 2048
+MAX_SUGGESTIONS = 20
+
+_HAS_HAN = re.compile(r"[\u4e00-\u9fff]")
+
+def text_keys(text: str) -> List[str]:
+    """文本的检索键：规范化原文、全拼、拼音首字母"""
+    keys = [normalize(text)]
+    if lazy_pinyin is not None and _HAS_HAN.search(text):
+        syllables = [s for s in lazy_pinyin(text) if normalize(s)]
+        keys.append(normalize(''.join(syllables)))
+        keys.append(normalize(''.join(s[0] for s in syllables)))
+    return [k for k in dict.fromkeys(keys) if k]
+
+def popularity(view_count: Optional[int], rating: Optional[float]) -> float:
+    return math.log1p(view_count or 0) + (rating or 0) / 10
+
+class SuggestIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # 有序的检索键与对应的 (电影id, 字段序号, 匹配文本)，整体替换保证一致
+        self.entries: Tuple[List[str], List[Tuple[int, int, str]]] = ([], [])
+        # 电影id -> (片名, 年份, 热度)
+        self.movies: Dict[int, Tuple[str, Optional[str], float]] = {}
+        self.max_id = 0
+        self.stale = True
+        self.built_at = 0.0
+        self.cache: "OrderedDict[Tuple[str, int], List[Dict]]" = OrderedDict()
+        self.task = PeriodicTask(self.tick, SYNC_INTERVAL)
+
+    def mark_stale(self) -> None:
+        """电影数据有变化时调用，后台任务会尽快全量重建"""
+        self.stale = True
+
+    def _entries(self, rows):
+        movies, pairs = {}, []
+        for row in rows:
+            movies[row.id] = (row.title, row.years, popularity(row.view_count, row.rating))
+            texts = [(0, row.title)] if row.title else []
+            texts += [(1, name) for name in split_names(row.director_description)]
+            texts += [(2, name) for name in split_names(row.leader)]
+            for field, text in texts:
+                for key in text_keys(text):
+                    pairs.append((key, (row.id, field, text)))
+        return movies, pairs
+
+    def _query(self, db: Session, min_id: int = 0):
+        return db.query(Movie.id, Movie.title, Movie.years, Movie.director_description,
+                        Movie.leader, Movie.view_count, Movie.rating)\
+            .filter(Movie.id > min_id).all()
+
+    def rebuild(self, db: Session) -> None:
+        """全量重建"""
+        rows = self._query(db)
+        movies, pairs = self._entries(rows)
+        pairs.sort()
+        with self.lock:
+            self.entries = ([k for k, _ in pairs], [ref for _, ref in pairs])
+            self.movies = movies
+            self.max_id = max((row.id for row in rows), default=0)
+            self.cache.clear()
+        self.built_at = time.monotonic()
+
+    def sync_new(self, db: Session) -> int:
+        """把新增的电影合并进有序数组"""
+        rows = self._query(db, self.max_id)
+        if not rows:
+            return 0
+        movies, pairs = self._entries(rows)
+        pairs.sort()
+        keys, refs = self.entries
+        merged = list(heapq.merge(zip(keys, refs), pairs))
+        with self.lock:
+            self.entries = ([k for k, _ in merged], [ref for _, ref in merged])
+            self.movies = {**self.movies, **movies}
+            self.max_id = max(self.max_id, max(row.id for row in rows))
+            self.cache.clear()
+        return len(rows)
+
+    def suggest(self, prefix: str, limit: int) -> List[Dict]:
+        """按前缀返回热度最高的电影"""
+        key = normalize(prefix)
+        if not key:
+            return []
+        cache_key = (key, limit)
+        with self.lock:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.cache.move_to_end(cache_key)
+                return cached
+            keys, refs = self.entries
+            movies = self.movies
+
+        lo = bisect_left(keys, key)
+        hi = bisect_left(keys, key + '\U0010ffff', lo)
+        best: Dict[int, Tuple[float, int, str]] = {}
+        for movie_id, field, text in refs[lo:hi]:
+            movie = movies.get(movie_id)
+            if movie is None:
+                continue
+            score = movie[2] + FIELD_BONUS[field]
+            if movie_id not in best or score > best[movie_id][0]:
+                best[movie_id] = (score, field, text)
+
+        top = heapq.nlargest(limit, best.items(), key=lambda item: item[1][0])
+        result = [
+            {"id": movie_id, "title": movies[movie_id][0], "years": movies[movie_id][1],
+             "field": FIELDS[field], "matched": text}
+            for movie_id, (_, field, text) in top
+        ]
+        with self.lock:
+            if self.entries[0] is not keys:  # 计算期间索引已更新，结果不缓存
+                return result
+            self.cache[cache_key] = result
+            if len(self.cache) > QUERY_CACHE_SIZE:
+                self.cache.popitem(last=False)
+        return result
+
+    def tick(self) -> None:
+        db = SessionLocal()
+        try:
+            if self.stale or time.monotonic() - self.built_at >= REBUILD_INTERVAL:
+                self.stale = False
+                self.rebuild(db)
+            else:
+                self.sync_new(db)
+        except Exception as e:
+            self.stale = True
+            print(f"更新搜索联想索引失败: {str(e)}")
+        finally:
+            db.close()
+
+    def start(self):
+        """在应用启动时开启后台任务"""
+        self.task.start()
+
+    async def stop(self):
+        await self.task.stop()
+
+suggest_index = SuggestIndex()
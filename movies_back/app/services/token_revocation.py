@@ -0,0 +1,138 @@
+"""
+令牌吊销
+登出、刷新令牌轮换时把令牌的 jti 写入 revoked_tokens。认证时先查进程内的布隆过滤器，
+未命中即可确定没有被吊销（绝大多数请求），命中时才按 jti 精确查询一次并缓存结果。
+后台任务按自增 id 增量同步其他进程写入的吊销记录，并定期清理已过期的记录、重建过滤器。
+其他进程的吊销最多延迟 SYNC_INTERVAL 秒生效。
+"""
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.revoked_token import RevokedToken
+from ..utils.bloom import BloomFilter
+from ..utils.cache import LRUCache
+from ..utils.periodic import PeriodicTask
+
+# 增量同步、清理重建的间隔（秒）
+SYNC_INTERVAL = 5
+REBUILD_INTERVAL = 3600
+# 增量同步时回看的 id 数，覆盖并发事务乱序提交留下的空洞
+SYNC_OVERLAP = 100
+# 过滤器容量（未过期的吊销记录数）与误判率；记录更多时按实际数量扩容
+BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+BLOOM_ERROR_RATE = 0.001
+# 过滤器命中后精确查询结果的缓存
+EXACT_CACHE_SIZE = 10000
+
+class TokenRevocations:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.filter: Optional[BloomFilter] = None
+        self.last_id = 0
+        self.rebuilt_at = 0.0
+        self.exact = LRUCache(maxsize=EXACT_CACHE_SIZE)
+        self.checks = 0
+        self.filter_hits = 0
+        self.task = PeriodicTask(self.tick, SYNC_INTERVAL)
+
+    def _ensure_loaded(self, db: Session) -> BloomFilter:
+        bloom = self.filter
+        if bloom is None:
+            # 首次使用时同步加载，之后由后台任务维护
+            with self.lock:
+                if self.filter is None:
+                    self._rebuild(db)
+            bloom = self.filter
+        return bloom
+
+    def revoke(self, db: Session, jti: str, expires_at: datetime) -> bool:
+        """吊销令牌并提交，本进程立即生效；返回是否为新吊销（jti 唯一，已存在时不写入）"""
+        result = db.execute(insert(RevokedToken).prefix_with("IGNORE").values(jti=jti, expires_at=expires_at))
+        db.commit()
+        self._ensure_loaded(db).add(jti)
+        self.exact.set(jti, True)
+        return result.rowcount > 0
+
+    def is_revoked(self, jti: str, db: Session) -> bool:
+        """令牌是否已吊销；只有过滤器命中时才查询数据库"""
+        self.checks += 1
+        if jti not in self._ensure_loaded(db):
+            return False
+        self.filter_hits += 1
+        revoked = self.exact.get(jti)
+        if revoked is None:
+            revoked = db.query(RevokedToken.id).filter(RevokedToken.jti == jti).first() is not None
+            self.exact.set(jti, revoked)
+        return revoked
+
+    def sync(self, db: Session) -> int:
+        """把其他进程新写入的吊销记录加入过滤器"""
+        with self.lock:
+            return self._sync(db)
+
+    def _sync(self, db: Session) -> int:
+        rows = db.query(RevokedToken.id, RevokedToken.jti)\
+            .filter(RevokedToken.id > self.last_id - SYNC_OVERLAP).all()
+        bloom = self.filter
+        for row_id, jti in rows:
+            bloom.add(jti)
+            # 之前精确查询为未吊销的结果已过时
+            self.exact.pop(jti)
+            self.last_id = max(self.last_id, row_id)
+        return len(rows)
+
+    def rebuild(self, db: Session) -> None:
+        """清理已过期的记录，按剩余记录重建过滤器"""
+        db.query(RevokedToken).filter(RevokedToken.expires_at < datetime.utcnow())\
+            .delete(synchronize_session=False)
+        db.commit()
+        with self.lock:
+            self._rebuild(db)
+
+    def _rebuild(self, db: Session) -> None:
+        last_id = db.query(func.max(RevokedToken.id)).scalar() or 0
+        jtis = [jti for (jti,) in db.query(RevokedToken.jti).filter(RevokedToken.id <= last_id).all()]
+        bloom = BloomFilter(max(BLOOM_CAPACITY, len(jtis) * 2), BLOOM_ERROR_RATE)
+        for jti in jtis:
+            bloom.add(jti)
+        self.filter, self.last_id = bloom, last_id
+        # 补上读取期间提交的记录
+        self._sync(db)
+        self.rebuilt_at = time.monotonic()
+
+    def tick(self) -> None:
+        db = SessionLocal()
+        try:
+            if self.filter is None or time.monotonic() - self.rebuilt_at >= REBUILD_INTERVAL:
+                self.rebuild(db)
+            else:
+                self.sync(db)
+        except Exception as e:
+            db.rollback()
+            print(f"同步令牌吊销记录失败: {str(e)}")
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        return {
+            "revoked": len(self.filter) if self.filter is not None else 0,
+            "checks": self.checks,
+            "filter_hits": self.filter_hits,
+        }
+
+    def start(self):
+        """在应用启动时开启后台同步"""
+        self.task.start()
+
+    async def stop(self):
+        await self.task.stop()
+
+token_revocations = TokenRevocations()
@@ -0,0 +1,199 @@
+import asyncio
+import heapq
+import threading
+import time
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.activity import MovieActivityHourly
+from ..models.movie import Movie
+from ..utils.fields import load_movies
+from ..utils.pagination import encode_cursor, decode_cursor
+from ..utils.periodic import PeriodicTask
+
+# 热度半衰期（小时）
+HALF_LIFE_HOURS = 24
+# 只统计最近这么多小时的活动，更早的小时桶定期删除
+WINDOW_HOURS = 24 * 14
+# 一次评价折算的浏览次数
+REVIEW_WEIGHT = 5.0
+# 没有活动的电影按豆瓣评分兜底排序，权重远小于一次浏览
+RATING_PRIOR_WEIGHT = 0.001
+# 预计算的热门榜长度
+TOP_N = 1000
+# 后台增量更新间隔、从数据库全量重算（合并其他进程的活动）的间隔（秒）
+TICK_INTERVAL = 60
+RESYNC_INTERVAL = 600
+
+def current_hour() -> int:
+    return int(time.time() // 3600)
+
+def decay(hours: float) -> float:
+    return 0.5 ** (hours / HALF_LIFE_HOURS)
+
+class TrendingEngine:
+    """
+    时间衰减热度榜。
+    浏览和评价事件先在内存中按 (电影, 小时) 聚合，后台任务定期写入 movie_activity_hourly，
+    并在内存分数上乘以衰减系数、累加新事件，得到增量更新后的热度，再预先排好前 TOP_N 名。
+    请求只在预计算的列表上切片。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tick_lock = threading.Lock()
+        self.pending: Dict[Tuple[int, int], List[int]] = {}
+        # 以 scored_hour 为基准的热度分数
+        self.scores: Dict[int, float] = {}
+        self.scored_hour = current_hour()
+        # 降序排列的 (分数, 电影id)，以及供二分查找的 (-分数, -id)，整体替换保证一致
+        self.ranked: Tuple[List[Tuple[float, int]], List[Tuple[float, int]]] = ([], [])
+        self.ranked_at = 0.0
+        self.synced_at = 0.0
+        self.task = PeriodicTask(self.tick, TICK_INTERVAL)
+
+    def record_view(self, movie_id: int) -> None:
+        self._record(movie_id, 0)
+
+    def record_review(self, movie_id: int) -> None:
+        self._record(movie_id, 1)
+
+    def _record(self, movie_id: int, kind: int) -> None:
+        key = (movie_id, current_hour())
+        with self.lock:
+            counts = self.pending.get(key)
+            if counts is None:
+                counts = self.pending[key] = [0, 0]
+            counts[kind] += 1
+
+    def _flush(self, db: Session, batch) -> None:
+        """把小时桶增量写入数据库"""
+        if not batch:
+            return
+        stmt = insert(MovieActivityHourly).values([
+            {"movie_id": movie_id, "hour": hour, "views": views, "reviews": reviews}
+            for (movie_id, hour), (views, reviews) in batch.items()
+        ])
+        db.execute(stmt.on_duplicate_key_update(
+            views=MovieActivityHourly.views + stmt.inserted.views,
+            reviews=MovieActivityHourly.reviews + stmt.inserted.reviews,
+        ))
+        db.commit()
+
+    def _resync(self, db: Session, now_hour: int) -> Dict[int, float]:
+        """从小时桶全量计算热度，并清理窗口外的数据"""
+        cutoff = now_hour - WINDOW_HOURS
+        weight = MovieActivityHourly.views + REVIEW_WEIGHT * MovieActivityHourly.reviews
+        rows = db.query(
+            MovieActivityHourly.movie_id,
+            func.sum(weight * func.pow(0.5, (now_hour - MovieActivityHourly.hour) / HALF_LIFE_HOURS))
+        ).filter(MovieActivityHourly.hour >= cutoff)\
+            .group_by(MovieActivityHourly.movie_id).all()
+        db.query(MovieActivityHourly).filter(MovieActivityHourly.hour < cutoff)\
+            .delete(synchronize_session=False)
+        db.commit()
+        return {movie_id: float(score) for movie_id, score in rows}
+
+    def _rank(self, db: Session, scores: Dict[int, float]) -> List[Tuple[float, int]]:
+        """合并活动热度与评分兜底，取前 TOP_N 名"""
+        top_active = heapq.nlargest(TOP_N, scores.items(), key=lambda item: item[1])
+        ratings = {}
+        if top_active:
+            ratings = dict(db.query(Movie.id, Movie.rating)
+                           .filter(Movie.id.in_([movie_id for movie_id, _ in top_active])).all())
+        # 评分兜底候选走 (rating, id) 索引
+        prior = db.query(Movie.id, Movie.rating)\
+            .order_by(Movie.rating.desc(), Movie.id.desc()).limit(TOP_N).all()
+
+        combined = {movie_id: RATING_PRIOR_WEIGHT * (rating or 0) for movie_id, rating in prior}
+        for movie_id, score in top_active:
+            if movie_id in ratings:  # 已删除的电影不再上榜
+                combined[movie_id] = score + RATING_PRIOR_WEIGHT * (ratings[movie_id] or 0)
+        return heapq.nlargest(TOP_N, ((score, movie_id) for movie_id, score in combined.items()))
+
+    def tick(self) -> None:
+        """增量更新热度并重新生成榜单"""
+        with self.tick_lock:
+            self._tick()
+
+    def _tick(self) -> None:
+        with self.lock:
+            batch, self.pending = self.pending, {}
+
+        db = SessionLocal()
+        try:
+            try:
+                self._flush(db, batch)
+            except Exception:
+                db.rollback()
+                with self.lock:
+                    for key, (views, reviews) in batch.items():
+                        counts = self.pending.setdefault(key, [0, 0])
+                        counts[0] += views
+                        counts[1] += reviews
+                raise
+
+            now_hour = current_hour()
+            if time.monotonic() - self.synced_at >= RESYNC_INTERVAL:
+                scores = self._resync(db, now_hour)
+                self.synced_at = time.monotonic()
+            else:
+                # 增量：已有分数整体衰减到当前小时，再累加本轮事件
+                factor = decay(now_hour - self.scored_hour)
+                scores = {movie_id: score * factor for movie_id, score in self.scores.items()} \
+                    if factor != 1 else dict(self.scores)
+                for (movie_id, hour), (views, reviews) in batch.items():
+                    scores[movie_id] = scores.get(movie_id, 0.0) + \
+                        (views + REVIEW_WEIGHT * reviews) * decay(now_hour - hour)
+
+            ranking = self._rank(db, scores)
+            self.scores, self.scored_hour = scores, now_hour
+            self.ranked = (ranking, [(-score, -movie_id) for score, movie_id in ranking])
+            self.ranked_at = time.monotonic()
+        except Exception as e:
+            print(f"更新热度榜失败: {str(e)}")
+        finally:
+            db.close()
+
+    def page(self, limit: int, cursor: Optional[str] = None) -> Tuple[List[int], Optional[str]]:
+        """从预计算榜单中取一页电影id，游标为上一页最后一项的 (分数, id)"""
+        ranking, keys = self.ranked
+        start = 0
+        if cursor:
+            score, last_id = decode_cursor(cursor)
+            start = bisect_right(keys, (-float(score), -last_id))
+        items = ranking[start:start + limit]
+        next_cursor = None
+        if items and start + limit < len(ranking):
+            next_cursor = encode_cursor(items[-1][0], items[-1][1])
+        return [movie_id for _, movie_id in items], next_cursor
+
+    def hot_movies(self, db: Session, limit: int, cursor: Optional[str] = None,
+                   fields: Optional[List[str]] = None):
+        """返回一页热门电影及下一页游标（fields 指定时只查询这些列）"""
+        if not self.ranked_at:
+            # 后台任务尚未生成榜单（刚启动或数据库异常）时不在请求中计算，
+            # 按评分兜底返回第一页，与榜单中无活动电影的顺序一致
+            if cursor:
+                return [], None
+            ids = [movie_id for (movie_id,) in db.query(Movie.id)
+                   .order_by(Movie.rating.desc(), Movie.id.desc()).limit(limit).all()]
+            return load_movies(db, ids, fields), None
+        ids, next_cursor = self.page(limit, cursor)
+        return load_movies(db, ids, fields), next_cursor
+
+    def start(self):
+        """在应用启动时开启后台任务"""
+        self.task.start()
+
+    async def stop(self):
+        """停止后台任务并写入剩余事件"""
+        await self.task.stop()
+        await asyncio.to_thread(self.tick)
+
+trending = TrendingEngine()
@@ -0,0 +1,233 @@
+"""
+用户评价历史与汇总
+评价列表按 (created_at, id) 游标分页，或以 NDJSON 流式导出，只取列表需要的电影字段。
+每个用户的评价数、评分总和及按标签/国家/年份的计数保存在 user_review_stats、user_review_facets，
+评价写入时在同一事务中累加增量，汇总接口按主键读取。
+电影的标签等元数据变化不会回溯更新计数，reconcile 全量重算：python -m app.services.user_reviews
+"""
+import json
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.country import Country, MovieCountry
+from ..models.movie import Movie
+from ..models.review import MovieReview
+from ..models.tag import Tag, MovieTag
+from ..models.user_stats import UserReviewStats, UserReviewFacet
+from ..utils.pagination import paginate
+
+# 汇总中标签、国家各返回的数量（年份全部返回）
+SUMMARY_FACET_LIMIT = 20
+# 流式导出每次从数据库取回的行数
+STREAM_BATCH_SIZE = 500
+
+def user_reviews_query(db: Session, user_id: int):
+    """用户评价列表的查询，只关联取回片名和年份"""
+    return db.query(
+        MovieReview.id, MovieReview.movie_id, Movie.title.label("movie_title"), Movie.years.label("year"),
+        MovieReview.rating, MovieReview.content, MovieReview.created_at
+    ).join(Movie, Movie.id == MovieReview.movie_id)\
+        .filter(MovieReview.user_id == user_id)
+
+def user_reviews_page(db: Session, user_id: int, limit: int,
+                      cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """用户评价（最新在前），返回 (当前页, 下一页游标)"""
+    rows, next_cursor = paginate(
+        user_reviews_query(db, user_id), MovieReview.created_at, MovieReview.id, limit, cursor,
+        descending=True
+    )
+    return [row._asdict() for row in rows], next_cursor
+
+def _json_default(value):
+    return value.isoformat()
+
+def stream_user_reviews(user_id: int) -> Iterator[bytes]:
+    """逐行输出用户的全部评价（NDJSON），使用独立会话和服务端游标，内存占用与评价数无关"""
+    db = SessionLocal()
+    try:
+        query = user_reviews_query(db, user_id)\
+            .order_by(MovieReview.created_at.desc(), MovieReview.id.desc())\
+            .execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE)
+        for row in query:
+            line = json.dumps(row._asdict(), ensure_ascii=False, default=_json_default)
+            yield (line + "\n").encode("utf-8")
+    finally:
+        db.close()
+
+def movie_facets(db: Session, movie_ids: Iterable[int]) -> Dict[int, List[Tuple[str, str]]]:
+    """电影的 (维度, 取值) 列表，与分面浏览一致：标签、国家取关联表，年份取 release_year"""
+    movie_ids = list(movie_ids)
+    facets: Dict[int, List[Tuple[str, str]]] = defaultdict(list)
+    for movie_id, name in db.query(MovieTag.movie_id, Tag.name)\
+            .join(Tag, Tag.id == MovieTag.tag_id).filter(MovieTag.movie_id.in_(movie_ids)).all():
+        facets[movie_id].append(("tag", name))
+    for movie_id, name in db.query(MovieCountry.movie_id, Country.name)\
+            .join(Country, Country.id == MovieCountry.country_id).filter(MovieCountry.movie_id.in_(movie_ids)).all():
+        facets[movie_id].append(("country", name))
+    for movie_id, year in db.query(Movie.id, Movie.release_year)\
+            .filter(Movie.id.in_(movie_ids), Movie.release_year.isnot(None)).all():
+        facets[movie_id].append(("year", str(year)))
+    return facets
+
+def apply_user_changes(db: Session,
+                       changes: Iterable[Tuple[int, int, Optional[float], Optional[float]]]) -> None:
+    """
+    累加一批评价变化 (用户id, 电影id, 原评分, 新评分)，None 表示新增或删除。
+    只执行语句不提交，由调用方和评价写入一起提交。
+    """
+    stats: Dict[int, List[float]] = defaultdict(lambda: [0, 0.0])
+    presence: Dict[Tuple[int, int], int] = defaultdict(int)
+    for user_id, movie_id, old, new in changes:
+        for rating, sign in ((old, -1), (new, 1)):
+            if rating is not None:
+                stats[user_id][0] += sign
+                stats[user_id][1] += sign * rating
+        presence[(user_id, movie_id)] += (new is not None) - (old is not None)
+
+    rows = [{"user_id": user_id, "review_count": count, "rating_sum": total}
+            for user_id, (count, total) in stats.items() if count or total]
+    if rows:
+        stmt = insert(UserReviewStats).values(rows)
+        db.execute(stmt.on_duplicate_key_update(
+            review_count=UserReviewStats.review_count + stmt.inserted.review_count,
+            rating_sum=UserReviewStats.rating_sum + stmt.inserted.rating_sum,
+        ))
+
+    # 只有新增、删除评价会改变维度计数，修改评分不会
+    moved = {key: sign for key, sign in presence.items() if sign}
+    if not moved:
+        return
+    facets = movie_facets(db, {movie_id for _, movie_id in moved})
+    counts: Dict[Tuple[int, str, str], int] = defaultdict(int)
+    for (user_id, movie_id), sign in moved.items():
+        for facet, value in facets.get(movie_id, ()):
+            counts[(user_id, facet, value)] += sign
+    rows = [{"user_id": user_id, "facet": facet, "value": value, "count": count}
+            for (user_id, facet, value), count in counts.items() if count]
+    if not rows:
+        return
+    stmt = insert(UserReviewFacet).values(rows)
+    db.execute(stmt.on_duplicate_key_update(count=UserReviewFacet.count + stmt.inserted.count))
+    if any(row["count"] < 0 for row in rows):
+        db.query(UserReviewFacet)\
+            .filter(UserReviewFacet.user_id.in_({row["user_id"] for row in rows}), UserReviewFacet.count <= 0)\
+            .delete(synchronize_session=False)
+
+def apply_written_review(db: Session, review_id: int) -> None:
+    """
+    按刚写入的评价行在数据库中累加用户汇总：评分增量来自 prev_rating，
+    新增评价（prev_rating 为空）时各维度计数加一。不提交。
+    """
+    params = {"review_id": review_id}
+    db.execute(text("""
+        INSERT INTO user_review_stats (user_id, review_count, rating_sum)
+        SELECT user_id, prev_rating IS NULL, rating - COALESCE(prev_rating, 0)
+        FROM movie_reviews
+        WHERE id = :review_id
+        ON DUPLICATE KEY UPDATE review_count = review_count + VALUES(review_count),
+                                rating_sum = rating_sum + VALUES(rating_sum)
+    """), params)
+    db.execute(text("""
+        INSERT INTO user_review_facets (user_id, facet, value, count)
+        SELECT * FROM (
+            SELECT r.user_id, 'tag' AS facet, t.name AS value, 1 AS count
+            FROM movie_reviews r
+            JOIN movie_tags mt ON mt.movie_id = r.movie_id
+            JOIN tags t ON t.id = mt.tag_id
+            WHERE r.id = :review_id AND r.prev_rating IS NULL
+            UNION ALL
+            SELECT r.user_id, 'country', c.name, 1
+            FROM movie_reviews r
+            JOIN movie_countries mc ON mc.movie_id = r.movie_id
+            JOIN countries c ON c.id = mc.country_id
+            WHERE r.id = :review_id AND r.prev_rating IS NULL
+            UNION ALL
+            SELECT r.user_id, 'year', CAST(m.release_year AS CHAR), 1
+            FROM movie_reviews r
+            JOIN movies_top250 m ON m.id = r.movie_id
+            WHERE r.id = :review_id AND r.prev_rating IS NULL AND m.release_year IS NOT NULL
+        ) f
+        ON DUPLICATE KEY UPDATE count = user_review_facets.count + f.count
+    """), params)
+
+def forget_user(db: Session, user_id: int) -> None:
+    """删除用户的汇总（不提交）"""
+    db.query(UserReviewStats).filter(UserReviewStats.user_id == user_id).delete(synchronize_session=False)
+    db.query(UserReviewFacet).filter(UserReviewFacet.user_id == user_id).delete(synchronize_session=False)
+
+def user_summary(db: Session, user_id: int) -> Dict:
+    """用户的评价数、平均分，以及标签、国家（按数量降序）和年份（升序）的分布"""
+    stats = db.query(UserReviewStats.review_count, UserReviewStats.rating_sum)\
+        .filter(UserReviewStats.user_id == user_id).first()
+    count = stats.review_count if stats else 0
+    facets: Dict[str, List[Dict]] = {"tag": [], "country": [], "year": []}
+    for facet, value, facet_count in db.query(UserReviewFacet.facet, UserReviewFacet.value, UserReviewFacet.count)\
+            .filter(UserReviewFacet.user_id == user_id, UserReviewFacet.count > 0)\
+            .order_by(UserReviewFacet.count.desc(), UserReviewFacet.value).all():
+        if facet in facets:
+            facets[facet].append({"value": value, "count": facet_count})
+    facets["tag"] = facets["tag"][:SUMMARY_FACET_LIMIT]
+    facets["country"] = facets["country"][:SUMMARY_FACET_LIMIT]
+    facets["year"].sort(key=lambda item: item["value"])
+    return {
+        "review_count": count,
+        "average_rating": round(stats.rating_sum / count, 2) if count else None,
+        "facets": facets,
+    }
+
+def reconcile(db: Session) -> None:
+    """从 movie_reviews 全量重算用户汇总，在一个事务中替换，重算期间读取的仍是旧数据"""
+    db.execute(text("""
+        INSERT INTO user_review_stats (user_id, review_count, rating_sum)
+        SELECT user_id, COUNT(*), SUM(rating)
+        FROM movie_reviews
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+        ON DUPLICATE KEY UPDATE review_count = VALUES(review_count), rating_sum = VALUES(rating_sum)
+    """))
+    db.execute(text("""
+        DELETE s FROM user_review_stats s
+        LEFT JOIN (SELECT DISTINCT user_id FROM movie_reviews) r ON r.user_id = s.user_id
+        WHERE r.user_id IS NULL
+    """))
+    db.execute(text("DELETE FROM user_review_facets"))
+    db.execute(text("""
+        INSERT INTO user_review_facets (user_id, facet, value, count)
+        SELECT r.user_id, 'tag', t.name, COUNT(*)
+        FROM movie_reviews r
+        JOIN movie_tags mt ON mt.movie_id = r.movie_id
+        JOIN tags t ON t.id = mt.tag_id
+        WHERE r.user_id IS NOT NULL
+        GROUP BY r.user_id, t.name
+    """))
+    db.execute(text("""
+        INSERT INTO user_review_facets (user_id, facet, value, count)
+        SELECT r.user_id, 'country', c.name, COUNT(*)
+        FROM movie_reviews r
+        JOIN movie_countries mc ON mc.movie_id = r.movie_id
+        JOIN countries c ON c.id = mc.country_id
+        WHERE r.user_id IS NOT NULL
+        GROUP BY r.user_id, c.name
+    """))
+    db.execute(text("""
+        INSERT INTO user_review_facets (user_id, facet, value, count)
+        SELECT r.user_id, 'year', CAST(m.release_year AS CHAR), COUNT(*)
+        FROM movie_reviews r
+        JOIN movies_top250 m ON m.id = r.movie_id
+        WHERE r.user_id IS NOT NULL AND m.release_year IS NOT NULL
+        GROUP BY r.user_id, m.release_year
+    """))
+    db.commit()
+
+if __name__ == "__main__":
+    session = SessionLocal()
+    try:
+        reconcile(session)
+        print("用户评价汇总已重算")
+    finally:
+        session.close()
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+from typing import Dict
+
+from sqlalchemy import case, update
+
+from ..database import SessionLocal
+from ..models.movie import Movie
+from ..utils.periodic import PeriodicTask
+
+# 浏览量落库间隔（秒）
+FLUSH_INTERVAL = 5
+
+class ViewCounter:
+    """
+    浏览量写回缓冲。
+    请求只在内存中累加，后台任务按间隔把所有增量合并为一条 UPDATE 写入 movies_top250，
+    避免热门电影在每次浏览时争抢行锁。
+    """
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.pending: Dict[int, int] = {}
+        # 本进程启动以来的累计浏览量，落库后不清零，用于在缓存数据上叠加
+        self.totals: Dict[int, int] = {}
+        # 正在写入、尚未提交的增量
+        self.in_flight: Dict[int, int] = {}
+        self.task = PeriodicTask(self.flush, self.flush_interval)
+
+    def record(self, movie_id: int) -> int:
+        """记录一次浏览，返回本进程对该电影的累计浏览量"""
+        with self.lock:
+            self.pending[movie_id] = self.pending.get(movie_id, 0) + 1
+            total = self.totals.get(movie_id, 0) + 1
+            self.totals[movie_id] = total
+            return total
+
+    def pending_count(self, movie_id: int) -> int:
+        """该电影尚未落库的浏览量"""
+        return self.pending.get(movie_id, 0)
+
+    def flushed_count(self, movie_id: int) -> int:
+        """本进程已写入数据库的浏览量"""
+        with self.lock:
+            return (self.totals.get(movie_id, 0) - self.pending.get(movie_id, 0)
+                    - self.in_flight.get(movie_id, 0))
+
+    def flush(self) -> int:
+        """把缓冲的增量一次性写入数据库，返回更新的电影数"""
+        with self.lock:
+            batch, self.pending = self.pending, {}
+            self.in_flight = batch
+        if not batch:
+            return 0
+
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(Movie)
+                .where(Movie.id.in_(batch.keys()))
+                .values(view_count=Movie.view_count + case(batch, value=Movie.id, else_=0))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            with self.lock:
+                self.in_flight = {}
+            return len(batch)
+        except Exception as e:
+            db.rollback()
+            # 写入失败时把增量放回缓冲，等待下次重试
+            with self.lock:
+                self.in_flight = {}
+                for movie_id, count in batch.items():
+                    self.pending[movie_id] = self.pending.get(movie_id, 0) + count
+            print(f"浏览量落库失败: {str(e)}")
+            return 0
+        finally:
+            db.close()
+
+    def start(self):
+        """在应用启动时开启后台落库任务"""
+        self.task.start()
+
+    async def stop(self):
+        """在应用关闭时停止后台任务并写入剩余增量"""
+        await self.task.stop()
+        await asyncio.to_thread(self.flush)
+
+view_counter = ViewCounter()
@@ -1,5 +1,6 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import List, Optional
+from threading import Lock
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
@@ -7,9 +8,12 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
 import os
+import uuid
 
 from ..database import get_db
 from ..models.user import User
+from ..services.token_revocation import token_revocations
+from .cache import LRUCache
 
 # 加载环境变量
 load_dotenv()
@@ -18,43 +22,130 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+# 刷新令牌有效期（天）
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# 密码哈希方案，逗号分隔：第一个用于新哈希，其余只用于校验旧哈希（登录成功后自动改用第一个）。
+# 已有哈希均为 bcrypt，因此 bcrypt 总是保留用于校验。argon2 需要额外安装 argon2-cffi
+PASSWORD_SCHEMES = [s.strip() for s in os.getenv("PASSWORD_SCHEMES", "bcrypt").split(",") if s.strip()]
+# 第一个方案的成本（bcrypt 为 log2 轮数，pbkdf2 为迭代次数，argon2 为 time_cost），不设置时用 passlib 默认值
+PASSWORD_HASH_ROUNDS = os.getenv("PASSWORD_HASH_ROUNDS")
+
+def build_password_context(schemes: List[str], rounds: Optional[int] = None) -> CryptContext:
+    """
+    构造 CryptContext。指定成本时最小、最大轮数也设为该值，
+    成本调高或调低后，旧成本的哈希都会被 needs_update 识别并在登录时重新计算。
+    """
+    schemes = list(dict.fromkeys(schemes + ["bcrypt"]))
+    settings = {}
+    if rounds is not None:
+        for option in ("default_rounds", "min_rounds", "max_rounds"):
+            settings[f"{schemes[0]}__{option}"] = rounds
+    return CryptContext(schemes=schemes, deprecated="auto", **settings)
+
+pwd_context = build_password_context(
+    PASSWORD_SCHEMES, int(PASSWORD_HASH_ROUNDS) if PASSWORD_HASH_ROUNDS else None
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/token")
 
+# 已认证用户缓存：键为 (用户名, 令牌版本)，命中时不查询 users 表。
+# 本进程内的修改立即失效；多进程部署时其他进程最多在 TTL 内沿用旧数据
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+principal_cache = LRUCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+USER_COLUMNS = tuple(column.key for column in User.__table__.columns)
+# 失效次数，查询期间发生失效时不写入缓存，避免写回旧数据
+_invalidation_lock = Lock()
+_invalidations = 0
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def password_needs_update(hashed_password: str) -> bool:
+    """哈希的方案或成本与当前配置不一致"""
+    return pwd_context.needs_update(hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    to_encode = data.copy()
+    to_encode = {"type": "access", **data}
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    # jti 用于吊销单个令牌
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="无效的认证凭据",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def create_refresh_token(data: dict) -> str:
+    """刷新令牌只能用于换取新令牌，不能访问其他接口"""
+    return create_access_token({**data, "type": "refresh"}, timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+
+def decode_token(token: str) -> Optional[dict]:
+    """校验签名与有效期，无效时返回 None"""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.username == username).first()
+        return None
+
+def revoke_token(db: Session, payload: dict) -> bool:
+    """
+    吊销已解析的令牌，返回是否为本次吊销（此前已吊销时为 False）。
+    没有 jti 的旧令牌无法吊销，只能等待过期
+    """
+    jti = payload.get("jti")
+    if not jti:
+        return False
+    return token_revocations.revoke(db, jti, datetime.utcfromtimestamp(payload["exp"]))
+
+def token_claims(user: User) -> dict:
+    """令牌中携带的用户信息"""
+    return {"sub": user.username, "ver": user.token_version or 0}
+
+def load_principal(token: str, db: Session) -> Optional[User]:
+    """
+    解析令牌并返回对应的用户，令牌无效或版本已过期时返回 None。
+    返回的是未关联会话的副本，需要修改用户时应在会话中重新查询。
+    """
+    payload = decode_token(token)
+    if payload is None or payload.get("type", "access") != "access":
+        return None
+    username = payload.get("sub")
+    if username is None:
+        return None
+    jti = payload.get("jti")
+    if jti and token_revocations.is_revoked(jti, db):
+        return None
+    key = (username, payload.get("ver", 0))
+    values = principal_cache.get(key)
+    if values is None:
+        generation = _invalidations
+        user = db.query(User).filter(User.username == username).first()
+        if user is None or (user.token_version or 0) != key[1]:
+            return None
+        values = {name: getattr(user, name) for name in USER_COLUMNS}
+        with _invalidation_lock:
+            if generation == _invalidations:
+                principal_cache.set(key, values)
+    return User(**values)
+
+def invalidate_principal(user_id: int) -> None:
+    """用户信息修改或删除后调用"""
+    global _invalidations
+    with _invalidation_lock:
+        _invalidations += 1
+        principal_cache.discard_where(lambda key, values: values["id"] == user_id)
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    user = load_principal(token, db)
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无效的认证凭据",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
@@ -0,0 +1,39 @@
+import hashlib
+import math
+import threading
+
+class BloomFilter:
+    """
+    固定容量的布隆过滤器，只支持添加和查询。
+    查询不加锁；添加加锁，避免并发修改同一字节时丢失位。
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def _positions(self, key: str):
+        # 双重哈希：由一次摘要的两半派生 k 个位置
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        positions = self._positions(key)
+        with self.lock:
+            for p in positions:
+                self.bits[p >> 3] |= 1 << (p & 7)
+            self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def __len__(self) -> int:
+        return self.count
@@ -0,0 +1,56 @@
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from ..models.movie import Movie
+from ..schemas.movie import Movie as MovieSchema
+
+# 字段预设：首页卡片只需要这几个字段，不包含较长的简介
+FIELD_PRESETS = {
+    "card": ("id", "title", "rating", "cover_image", "years"),
+}
+MOVIE_FIELDS = tuple(MovieSchema.model_fields)
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    解析 fields 参数（逗号分隔的字段名或预设名），返回要查询的字段列表。
+    未指定时返回 None，表示返回完整字段。id 总是包含在内并排在第一位。
+    """
+    if not fields:
+        return None
+    names = ["id"]
+    for name in fields.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name in FIELD_PRESETS:
+            expanded = FIELD_PRESETS[name]
+        elif name in MOVIE_FIELDS:
+            expanded = (name,)
+        else:
+            raise HTTPException(status_code=400, detail=f"未知字段: {name}")
+        names.extend(n for n in expanded if n not in names)
+    return names
+
+def movie_query(db: Session, fields: Optional[List[str]], *extra_columns):
+    """
+    按字段列表构造查询，只 SELECT 需要的列。
+    extra_columns 为分页排序等需要但不返回的列，追加在末尾。
+    """
+    if fields is None:
+        return db.query(Movie)
+    columns = [getattr(Movie, name) for name in fields]
+    columns.extend(c for c in extra_columns if c.key not in fields)
+    return db.query(*columns)
+
+def load_movies(db: Session, ids: List[int], fields: Optional[List[str]] = None) -> List:
+    """按主键批量取回电影并保持 ids 的顺序"""
+    if not ids:
+        return []
+    movies = {m.id: m for m in movie_query(db, fields).filter(Movie.id.in_(ids)).all()}
+    return [movies[i] for i in ids if i in movies]
+
+def to_dicts(rows, fields: List[str]) -> List[Dict]:
+    """投影查询的结果行转为字典，末尾的额外列会被丢弃"""
+    return [dict(zip(fields, row)) for row in rows]
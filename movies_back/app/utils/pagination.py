@@ -0,0 +1,91 @@
+import base64
+import json
+import struct
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import DateTime, Float, and_, or_
+
+# 分页配置
+DEFAULT_PAGE_SIZE = 30
+MAX_PAGE_SIZE = 100
+
+def encode_cursor(key: Any, last_id: int) -> str:
+    """将排序键和id编码为不透明游标"""
+    raw = json.dumps([key, last_id], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    """解析游标，返回(排序键, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key, last_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return key, int(last_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+def cursor_key(sort_column, value: Any) -> Any:
+    """
+    游标中保存的排序键。MySQL 的 FLOAT 列按单精度存储、以较短的十进制文本返回（如 9.7），
+    与列比较时列会转为双精度（9.699999809…），因此需要换算成单精度对应的双精度值。
+    """
+    if value is not None and type(sort_column.type) is Float:
+        return struct.unpack("f", struct.pack("f", value))[0]
+    if isinstance(value, datetime):
+        # JSON 中以 ISO 格式保存，解析游标时还原为 datetime
+        return value.isoformat()
+    return value
+
+def parse_cursor_key(sort_column, key: Any) -> Any:
+    """把游标中的排序键还原为与列比较的值，DATETIME 列比较 datetime 而不是字符串"""
+    if key is not None and isinstance(sort_column.type, DateTime):
+        try:
+            return datetime.fromisoformat(key)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="无效的分页游标")
+    return key
+
+def keyset_filter(sort_column, id_column, key: Any, last_id: int, descending: bool = True):
+    """
+    构造游标之后的过滤条件，排序为 (sort_column, id_column) 同向。
+    MySQL中NULL在降序时排在最后、升序时排在最前。
+    """
+    if descending:
+        if key is None:
+            return and_(sort_column.is_(None), id_column < last_id)
+        return or_(
+            sort_column < key,
+            and_(sort_column == key, id_column < last_id),
+            sort_column.is_(None),
+        )
+    if key is None:
+        return or_(
+            and_(sort_column.is_(None), id_column > last_id),
+            sort_column.isnot(None),
+        )
+    return or_(sort_column > key, and_(sort_column == key, id_column > last_id))
+
+def paginate(query, sort_column, id_column, limit: int, cursor: Optional[str] = None,
+             descending: bool = True, key_getter=None):
+    """
+    对查询执行游标分页，返回(当前页结果, 下一页游标)。
+    多取一条用于判断是否还有下一页，深翻页也只扫描 limit+1 行索引。
+    """
+    if cursor:
+        key, last_id = decode_cursor(cursor)
+        key = parse_cursor_key(sort_column, key)
+        query = query.filter(keyset_filter(sort_column, id_column, key, last_id, descending))
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        key_getter = key_getter or (lambda row: cursor_key(sort_column, getattr(row, sort_column.key)))
+        next_cursor = encode_cursor(key_getter(last), getattr(last, id_column.key))
+    return rows, next_cursor
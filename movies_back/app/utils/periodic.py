@@ -0,0 +1,47 @@
+import asyncio
+from typing import Callable, Optional
+
+class PeriodicTask:
+    """
+    后台周期任务：在线程池中执行一步，然后休眠 interval 秒，如此循环。
+    各服务在应用启动时 start、关闭时 stop。stop 不用 cancel 结束：
+    to_thread 中正在执行的一步无法被取消，cancel 只会让 stop 提前返回、与之后的收尾并发；
+    这里通知循环退出并等待当前一步结束，休眠中则立即结束。
+    """
+
+    def __init__(self, step: Callable[[], object], interval: float):
+        self.step = step
+        self.interval = interval
+        self.task: Optional[asyncio.Task] = None
+        self.stopping: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None
+
+    async def _run(self):
+        while not self.stopping.is_set():
+            try:
+                await asyncio.to_thread(self.step)
+            except Exception as e:
+                print(f"后台任务 {self.step.__qualname__} 执行失败: {str(e)}")
+            if self.interval > 0:
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self):
+        if self.task is None:
+            self.stopping = asyncio.Event()
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """通知循环退出并等待正在执行的一步结束"""
+        if self.task is None:
+            return
+        self.stopping.set()
+        try:
+            await self.task
+        finally:
+            self.task = None
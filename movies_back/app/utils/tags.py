@@ -0,0 +1,30 @@
+import re
+from typing import List, Optional, Sequence, Union
+
+# 不同爬虫写入的分隔符不同：douban_movies 用 "/"，movies_csv 用 "|"，历史数据还有 "," 和空格
+TAG_SEPARATORS = re.compile(r"[/,|，\s]+")
+# 与 tags.name 的长度一致，写入和查询都按此截断
+MAX_TAG_LENGTH = 50
+
+def normalize_tag(tag: str) -> str:
+    """单个标签的规范形式，查询参数也应先经过这里再与 tags.name 比较"""
+    return tag.strip()[:MAX_TAG_LENGTH]
+
+def split_tags(tags: Optional[Union[str, Sequence[str]]]) -> List[str]:
+    """将标签字符串或列表拆分为去重后的标签列表（保持原有顺序）"""
+    if not tags:
+        return []
+    if isinstance(tags, (list, tuple)):
+        tags = '/'.join(tags)
+    result = []
+    for tag in TAG_SEPARATORS.split(tags):
+        tag = normalize_tag(tag)
+        if tag and tag not in result:
+            result.append(tag)
+    return result
+
+def split_names(text: Optional[str]) -> List[str]:
+    """导演、主演以 "/" 分隔，名字中可能有空格"""
+    if not text:
+        return []
+    return [name.strip() for name in text.split('/') if name.strip()]
@@ -0,0 +1,56 @@
+"""
+标签回填脚本
+解析 movies_top250.tags 中已有的标签字符串，写入 tags 和 movie_tags 表。
+可以重复执行，已存在的关联会被忽略。
+"""
+import pymysql
+
+from tag_writer import create_tag_tables, save_movie_tags
+
+# 数据库配置
+db_config = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': 'qaz741',
+    'database': 'movies_db',
+    'charset': 'utf8mb4'
+}
+
+BATCH_SIZE = 500
+
+def main():
+    connection = pymysql.connect(**db_config)
+    try:
+        with connection.cursor() as cursor:
+            create_tag_tables(cursor)
+            connection.commit()
+
+            last_id = 0
+            movie_count = 0
+            link_count = 0
+            while True:
+                # 按主键分批读取，避免一次加载整张表
+                cursor.execute(
+                    "SELECT id, tags FROM movies_top250 WHERE id > %s ORDER BY id LIMIT %s",
+                    (last_id, BATCH_SIZE)
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                for movie_id, tags in rows:
+                    link_count += save_movie_tags(cursor, movie_id, tags)
+                connection.commit()
+                movie_count += len(rows)
+                last_id = rows[-1][0]
+                print(f"已处理 {movie_count} 部电影")
+
+        print(f"回填完成: {movie_count} 部电影, {link_count} 条标签关联")
+    except Exception as e:
+        connection.rollback()
+        print(f"回填标签失败: {str(e)}")
+        raise
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    main()
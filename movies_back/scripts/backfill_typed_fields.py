@@ -0,0 +1,84 @@
+"""
+数值字段回填脚本
+一次性解析已有数据：movies_top250.years -> release_year，movie_details.duration -> duration_minutes，
+movies_top250.country -> countries/movie_countries。可以重复执行。
+"""
+import pymysql
+
+from migrate_schema import migrate_typed_columns
+from typed_fields import parse_year, parse_duration, save_movie_countries
+
+# 数据库配置
+db_config = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': 'qaz741',
+    'database': 'movies_db',
+    'charset': 'utf8mb4'
+}
+
+BATCH_SIZE = 500
+
+def backfill_movies(connection, cursor):
+    """回填年份和国家关联"""
+    last_id = 0
+    count = 0
+    while True:
+        cursor.execute(
+            "SELECT id, years, country FROM movies_top250 WHERE id > %s ORDER BY id LIMIT %s",
+            (last_id, BATCH_SIZE)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        cursor.executemany(
+            "UPDATE movies_top250 SET release_year = %s WHERE id = %s",
+            [(parse_year(years), movie_id) for movie_id, years, _ in rows]
+        )
+        for movie_id, _, country in rows:
+            save_movie_countries(cursor, movie_id, country)
+        connection.commit()
+        count += len(rows)
+        last_id = rows[-1][0]
+        print(f"已处理 {count} 部电影")
+
+def backfill_durations(connection, cursor):
+    """回填片长分钟数"""
+    last_id = 0
+    count = 0
+    while True:
+        cursor.execute(
+            "SELECT id, duration FROM movie_details WHERE id > %s ORDER BY id LIMIT %s",
+            (last_id, BATCH_SIZE)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        cursor.executemany(
+            "UPDATE movie_details SET duration_minutes = %s WHERE id = %s",
+            [(parse_duration(duration), detail_id) for detail_id, duration in rows]
+        )
+        connection.commit()
+        count += len(rows)
+        last_id = rows[-1][0]
+        print(f"已处理 {count} 条电影详情")
+
+def main():
+    connection = pymysql.connect(**db_config)
+    try:
+        with connection.cursor() as cursor:
+            # 确保字段和表已存在
+            migrate_typed_columns(cursor)
+            connection.commit()
+            backfill_movies(connection, cursor)
+            backfill_durations(connection, cursor)
+        print("回填完成")
+    except Exception as e:
+        connection.rollback()
+        print(f"回填数值字段失败: {str(e)}")
+        raise
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    main()
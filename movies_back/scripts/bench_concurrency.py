@@ -0,0 +1,89 @@
+"""
+并发压测脚本
+用固定数量的并发客户端持续请求接口，输出吞吐量和延迟分位数。
+同时可以指定一个探测接口，观察慢查询是否拖慢其他请求（事件循环被阻塞时探测延迟会明显升高）。
+
+示例：
+    python bench_concurrency.py --url http://localhost:8000/api/movies/search?keyword=爱 \
+        --probe-url http://localhost:8000/api/users/logout --probe-method POST \
+        --concurrency 200 --duration 30
+在改动前后的代码上分别运行，对比 p99。
+依赖 httpx（已列入 requirements.txt）。
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+def percentile(values, p):
+    """计算分位数（毫秒）"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[index] * 1000
+
+def report(name, latencies, errors, elapsed):
+    print(f"\n[{name}]")
+    print(f"  请求数: {len(latencies)}  失败: {errors}  吞吐: {len(latencies) / elapsed:.1f} req/s")
+    print(f"  p50: {percentile(latencies, 50):.1f}ms  p95: {percentile(latencies, 95):.1f}ms  "
+          f"p99: {percentile(latencies, 99):.1f}ms  max: {percentile(latencies, 100):.1f}ms")
+
+async def timed_request(session, method, url, latencies, errors):
+    start = time.monotonic()
+    try:
+        response = await session.request(method, url)
+        if response.status_code >= 500:
+            errors[0] += 1
+            return
+    except Exception:
+        errors[0] += 1
+        return
+    latencies.append(time.monotonic() - start)
+
+async def worker(session, method, url, deadline, latencies, errors):
+    while time.monotonic() < deadline:
+        await timed_request(session, method, url, latencies, errors)
+
+async def probe(session, method, url, deadline, interval, latencies, errors):
+    while time.monotonic() < deadline:
+        await timed_request(session, method, url, latencies, errors)
+        await asyncio.sleep(interval)
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.concurrency + 1, max_keepalive_connections=args.concurrency + 1)
+    headers = {'Authorization': f'Bearer {args.token}'} if args.token else {}
+    async with httpx.AsyncClient(limits=limits, headers=headers, timeout=30) as session:
+        # 预热
+        await worker(session, args.method, args.url, time.monotonic() + 1, [], [0])
+
+        latencies, errors = [], [0]
+        probe_latencies, probe_errors = [], [0]
+        deadline = time.monotonic() + args.duration
+        tasks = [worker(session, args.method, args.url, deadline, latencies, errors)
+                 for _ in range(args.concurrency)]
+        if args.probe_url:
+            tasks.append(probe(session, args.probe_method, args.probe_url, deadline,
+                               args.probe_interval, probe_latencies, probe_errors))
+
+        start = time.monotonic()
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - start
+
+    print(f"并发客户端: {args.concurrency}  时长: {elapsed:.1f}s")
+    report(args.url, latencies, errors[0], elapsed)
+    if args.probe_url:
+        report(f"探测 {args.probe_url}", probe_latencies, probe_errors[0], elapsed)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="接口并发压测")
+    parser.add_argument('--url', required=True, help='压测接口')
+    parser.add_argument('--method', default='GET')
+    parser.add_argument('--probe-url', help='探测接口，用于观察其他请求是否被阻塞')
+    parser.add_argument('--probe-method', default='GET')
+    parser.add_argument('--probe-interval', type=float, default=0.05, help='探测间隔（秒）')
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--token', help='需要登录的接口使用的access_token')
+    asyncio.run(main(parser.parse_args()))
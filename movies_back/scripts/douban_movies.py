@@ -6,6 +6,9 @@ import pymysql
 import time
 from datetime import datetime
 
+from tag_writer import create_tag_tables, save_movie_tags
+from typed_fields import parse_year, initial_community_score, create_country_tables, save_movie_countries
+
 # MySQL 配置
 db_config = {
     'host': 'localhost',  # 数据库主机
@@ -50,14 +53,20 @@ def create_table():
                     leader VARCHAR(100),
                     tags VARCHAR(255),
                     years VARCHAR(10),
+                    release_year INT NULL,
                     country VARCHAR(100),
                     director_description VARCHAR(100),
                     cover_image VARCHAR(500),
                     view_count INT DEFAULT 0,
-                    INDEX idx_douban_id (douban_id)
+                    community_score DOUBLE NULL,
+                    INDEX idx_douban_id (douban_id),
+                    INDEX idx_release_year_rating (release_year, rating),
+                    INDEX idx_community_score_id (community_score, id)
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
             """
             cursor.execute(sql)
+            create_tag_tables(cursor)
+            create_country_tables(cursor)
             connection.commit()
             print("数据库表创建成功")
     except Exception as e:
@@ -145,8 +154,8 @@ def insert_movie(movie):
     try:
         with connection.cursor() as cursor:
             sql = """
-                INSERT INTO movies_top250 (id, douban_id, title, description, rating, leader, tags, years, country, director_description, cover_image, view_count)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                INSERT INTO movies_top250 (id, douban_id, title, description, rating, leader, tags, years, release_year, country, director_description, cover_image, view_count, community_score)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             """
             cursor.execute(sql, (
                 movie.id,
@@ -157,11 +166,16 @@ def insert_movie(movie):
                 movie.leader,
                 '/'.join(movie.tags),
                 movie.years,
+                parse_year(movie.years),
                 movie.country,
                 movie.director_description,
                 movie.cover_image,
-                movie.view_count
+                movie.view_count,
+                initial_community_score(movie.rating)
             ))
+            # 同时写入规范化的标签关联
+            save_movie_tags(cursor, movie.id, movie.tags)
+            save_movie_countries(cursor, movie.id, movie.country)
             connection.commit()
     except Exception as e:
         logging.error(f"Error inserting movie {movie.title}: {str(e)}")
@@ -0,0 +1,178 @@
+"""
+数据库结构迁移脚本
+create_all 只会创建缺失的表，不会给已有表补充索引和字段，这里统一处理。
+每个迁移都可以重复执行。
+"""
+import pymysql
+
+from typed_fields import CREATE_COUNTRIES_SQL, CREATE_MOVIE_COUNTRIES_SQL, DEFAULT_PRIOR_RATING, PRIOR_WEIGHT
+
+# 数据库配置
+db_config = {
+    'host': 'localhost',
+    'user': 'root',
+    'password': 'qaz741',
+    'database': 'movies_db',
+    'charset': 'utf8mb4'
+}
+
+def index_exists(cursor, table, index_name):
+    """检查索引是否存在"""
+    cursor.execute(
+        """
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+        """,
+        (table, index_name)
+    )
+    return cursor.fetchone() is not None
+
+def table_exists(cursor, table):
+    """检查表是否存在"""
+    cursor.execute(
+        """
+        SELECT 1 FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = %s
+        LIMIT 1
+        """,
+        (table,)
+    )
+    return cursor.fetchone() is not None
+
+def column_exists(cursor, table, column):
+    """检查字段是否存在"""
+    cursor.execute(
+        """
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        LIMIT 1
+        """,
+        (table, column)
+    )
+    return cursor.fetchone() is not None
+
+def add_index(cursor, table, index_name, ddl):
+    """索引不存在时执行DDL"""
+    if index_exists(cursor, table, index_name):
+        print(f"索引 {table}.{index_name} 已存在，跳过")
+        return
+    cursor.execute(ddl)
+    print(f"已创建索引 {table}.{index_name}")
+
+def drop_index(cursor, table, index_name):
+    """索引存在时删除"""
+    if not index_exists(cursor, table, index_name):
+        return
+    cursor.execute(f"DROP INDEX {index_name} ON {table}")
+    print(f"已删除索引 {table}.{index_name}")
+
+def add_column(cursor, table, column, ddl):
+    """字段不存在时执行DDL"""
+    if column_exists(cursor, table, column):
+        print(f"字段 {table}.{column} 已存在，跳过")
+        return
+    cursor.execute(ddl)
+    print(f"已添加字段 {table}.{column}")
+
+def migrate_browse_indexes(cursor):
+    """按评分排序的游标分页索引"""
+    add_index(cursor, 'movies_top250', 'idx_rating_id',
+              "CREATE INDEX idx_rating_id ON movies_top250 (rating, id)")
+
+def migrate_typed_columns(cursor):
+    """年份、时长数值字段及国家关联表"""
+    add_column(cursor, 'movies_top250', 'release_year',
+               "ALTER TABLE movies_top250 ADD COLUMN release_year INT NULL AFTER years")
+    add_index(cursor, 'movies_top250', 'idx_release_year_rating',
+              "CREATE INDEX idx_release_year_rating ON movies_top250 (release_year, rating)")
+    add_column(cursor, 'movie_details', 'duration_minutes',
+               "ALTER TABLE movie_details ADD COLUMN duration_minutes INT NULL AFTER duration")
+    add_index(cursor, 'movie_details', 'idx_duration_minutes',
+              "CREATE INDEX idx_duration_minutes ON movie_details (duration_minutes)")
+    cursor.execute(CREATE_COUNTRIES_SQL)
+    cursor.execute(CREATE_MOVIE_COUNTRIES_SQL)
+    # 热门榜和国家过滤不再依赖字符串字段，清理旧索引
+    for index_name in ('idx_years_id', 'idx_years_rating', 'idx_country_rating'):
+        drop_index(cursor, 'movies_top250', index_name)
+
+def migrate_review_indexes(cursor):
+    """按电影分页读取评价的索引"""
+    add_index(cursor, 'movie_reviews', 'idx_reviews_movie_created',
+              "CREATE INDEX idx_reviews_movie_created ON movie_reviews (movie_id, created_at)")
+
+def migrate_community_score(cursor):
+    """社区评分字段及排行索引"""
+    add_column(cursor, 'movies_top250', 'community_score',
+               "ALTER TABLE movies_top250 ADD COLUMN community_score DOUBLE NULL")
+    add_index(cursor, 'movies_top250', 'idx_community_score_id',
+              "CREATE INDEX idx_community_score_id ON movies_top250 (community_score, id)")
+    # 回填尚未计算的社区评分，公式与 app/services/rating_stats.py 的 COMMUNITY_SCORE_SQL 一致
+    prior = f"COALESCE(NULLIF(m.rating, 0), {DEFAULT_PRIOR_RATING})"
+    if table_exists(cursor, 'movie_rating_stats'):
+        cursor.execute(f"""
+            UPDATE movies_top250 m
+            LEFT JOIN movie_rating_stats s ON s.movie_id = m.id
+            SET m.community_score = ({PRIOR_WEIGHT} * {prior} + 2 * COALESCE(s.rating_sum, 0))
+                / ({PRIOR_WEIGHT} + COALESCE(s.review_count, 0))
+            WHERE m.community_score IS NULL
+        """)
+    else:
+        # 还没有评分汇总表，社区评分即为先验
+        cursor.execute(f"UPDATE movies_top250 m SET m.community_score = {prior} WHERE m.community_score IS NULL")
+    print(f"已回填社区评分 {cursor.rowcount} 部，如已有站内评价，请运行 python -m app.services.rating_stats 重算评分汇总")
+
+def migrate_review_unique(cursor):
+    """评价去重并添加 (user_id, movie_id) 唯一约束"""
+    if not index_exists(cursor, 'movie_reviews', 'uq_reviews_user_movie'):
+        # 同一用户对同一电影的多条评价只保留最新的一条
+        cursor.execute("""
+            DELETE r FROM movie_reviews r
+            JOIN movie_reviews newer
+              ON newer.user_id = r.user_id AND newer.movie_id = r.movie_id AND newer.id > r.id
+        """)
+        print(f"已删除重复评价 {cursor.rowcount} 条，请运行 python -m app.services.rating_stats 重算评分汇总")
+    add_index(cursor, 'movie_reviews', 'uq_reviews_user_movie',
+              "CREATE UNIQUE INDEX uq_reviews_user_movie ON movie_reviews (user_id, movie_id)")
+    add_column(cursor, 'movie_reviews', 'prev_rating',
+               "ALTER TABLE movie_reviews ADD COLUMN prev_rating FLOAT NULL AFTER rating")
+
+def migrate_user_review_history(cursor):
+    """按用户分页读取评价的索引"""
+    add_index(cursor, 'movie_reviews', 'idx_reviews_user_created',
+              "CREATE INDEX idx_reviews_user_created ON movie_reviews (user_id, created_at)")
+    print("如为首次创建 user_review_stats，请运行 python -m app.services.user_reviews 初始化用户评价汇总")
+
+def migrate_token_version(cursor):
+    """用户令牌版本字段"""
+    add_column(cursor, 'users', 'token_version',
+               "ALTER TABLE users ADD COLUMN token_version INT NOT NULL DEFAULT 0")
+
+MIGRATIONS = [
+    migrate_browse_indexes,
+    migrate_typed_columns,
+    migrate_review_indexes,
+    migrate_community_score,
+    migrate_review_unique,
+    migrate_user_review_history,
+    migrate_token_version,
+]
+
+def main():
+    connection = pymysql.connect(**db_config)
+    try:
+        with connection.cursor() as cursor:
+            for migration in MIGRATIONS:
+                print(f"执行迁移: {migration.__doc__}")
+                migration(cursor)
+                connection.commit()
+        print("迁移完成")
+    except Exception as e:
+        connection.rollback()
+        print(f"迁移失败: {str(e)}")
+        raise
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,8 @@ import pymysql
 import time
 from typing import Optional, Dict, List
 
+from typed_fields import parse_duration
+
 # 数据库配置
 db_config = {
     'host': 'localhost',
@@ -248,6 +250,17 @@ class DatabaseManager:
 
 db_manager = DatabaseManager(db_config)
 
+def notify_cache_invalidation(douban_id):
+    """通知后端清理该电影的详情缓存"""
+    try:
+        db_manager.execute_query(
+            "INSERT INTO cache_invalidations (douban_id) VALUES (%s)",
+            (douban_id,)
+        )
+    except Exception as e:
+        # 后端未建表时忽略，缓存会在过期后自然刷新
+        print(f"写入缓存失效通知失败: {str(e)}")
+
 def save_movie_detail(douban_id, detail):
     if not detail:
         return False
@@ -263,20 +276,22 @@ def save_movie_detail(douban_id, detail):
             
         sql = """
             INSERT INTO movie_details 
-            (douban_id, actors, plot, duration, comment1, comment2, comment3, comment4, comment5)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            (douban_id, actors, plot, duration, duration_minutes, comment1, comment2, comment3, comment4, comment5)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
         db_manager.execute_query(sql, (
             douban_id,
             detail['actors'],
             detail['plot'],
             detail['duration'],
+            parse_duration(detail['duration']),
             detail['comments'][0],
             detail['comments'][1],
             detail['comments'][2],
             detail['comments'][3],
             detail['comments'][4]
         ))
+        notify_cache_invalidation(douban_id)
         print(f"保存电影 {douban_id} 详情成功")
         return True
     except Exception as e:
@@ -307,13 +322,15 @@ def create_details_table():
             actors TEXT,
             plot TEXT,
             duration VARCHAR(10),
+            duration_minutes INT NULL,
             comment1 TEXT,
             comment2 TEXT,
             comment3 TEXT,
             comment4 TEXT,
             comment5 TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_duration_minutes (duration_minutes)
         )
         """
         db_manager.execute_query(sql)
@@ -9,6 +9,9 @@ import pymysql
 from typing import List, Dict, Optional
 import os
 
+from tag_writer import create_tag_tables, save_movie_tags
+from typed_fields import parse_year, initial_community_score, create_country_tables, save_movie_countries
+
 # 数据库配置
 db_config = {
     'host': 'localhost',
@@ -62,14 +65,20 @@ class MovieCrawler:
                     leader VARCHAR(100),
                     tags VARCHAR(255),
                     years VARCHAR(10),
+                    release_year INT NULL,
                     country VARCHAR(100),
                     director_description VARCHAR(100),
                     cover_image VARCHAR(500),
                     view_count INT DEFAULT 0,
-                    INDEX idx_douban_id (douban_id)
+                    community_score DOUBLE NULL,
+                    INDEX idx_douban_id (douban_id),
+                    INDEX idx_release_year_rating (release_year, rating),
+                    INDEX idx_community_score_id (community_score, id)
                 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
                 """
                 cursor.execute(sql)
+                create_tag_tables(cursor)
+                create_country_tables(cursor)
                 connection.commit()
         except Exception as e:
             logging.error(f"创建表失败: {str(e)}")
@@ -90,29 +99,53 @@ class MovieCrawler:
                 sql = """
                 INSERT INTO movies_top250 (
                     douban_id, title, description, rating, leader,
-                    tags, years, country, director_description, cover_image, view_count
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    tags, years, release_year, country, director_description, cover_image, view_count,
+                    community_score
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 """
+                rating = float(movie_data['rating']) if movie_data['rating'] else 0.0
                 cursor.execute(sql, (
                     movie_data['douban_id'],
                     movie_data['title'],
                     '',  # description 默认为空
-                    float(movie_data['rating']) if movie_data['rating'] else 0.0,
+                    rating,
                     '',  # leader 默认为空
                     movie_data['tags'],
                     movie_data['years'],
+                    parse_year(movie_data['years']),
                     movie_data['country'],
                     movie_data['director_description'],
                     movie_data['cover_image'],
-                    0  # view_count 默认为0
+                    0,  # view_count 默认为0
+                    initial_community_score(rating)
                 ))
+                # 同时写入规范化的标签关联
+                movie_id = cursor.lastrowid
+                save_movie_tags(cursor, movie_id, movie_data['tags'])
+                save_movie_countries(cursor, movie_id, movie_data['country'])
                 connection.commit()
-                return True
+            self.notify_cache_invalidation(movie_data['douban_id'])
+            return True
         except Exception as e:
             logging.error(f"保存电影 {movie_data['title']} 失败: {str(e)}")
             connection.rollback()
             return False
 
+    def notify_cache_invalidation(self, douban_id: str):
+        """通知后端清理该电影的缓存"""
+        connection = self.connect_db()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO cache_invalidations (douban_id) VALUES (%s)",
+                    (douban_id,)
+                )
+                connection.commit()
+        except Exception as e:
+            # 后端未建表时忽略，缓存会在过期后自然刷新
+            logging.warning(f"写入缓存失效通知失败: {str(e)}")
+            connection.rollback()
+
     def ensure_data_dir(self):
         """确保数据目录存在"""
         if not os.path.exists(self.data_dir):
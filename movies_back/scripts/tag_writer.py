@@ -0,0 +1,50 @@
+"""
+标签写入工具，供各爬虫和回填脚本共用
+不同爬虫写入 movies_top250.tags 的分隔符不同（"/"、"|"、","、空格），这里统一拆分后
+写入 tags 和 movie_tags 两张表。拆分规则与后端查询共用 app/utils/tags.py，保证写入与查询一致。
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.tags import split_tags
+
+CREATE_TAGS_SQL = """
+    CREATE TABLE IF NOT EXISTS tags (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(50) NOT NULL,
+        UNIQUE INDEX ix_tags_name (name)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+"""
+
+CREATE_MOVIE_TAGS_SQL = """
+    CREATE TABLE IF NOT EXISTS movie_tags (
+        tag_id INT NOT NULL,
+        movie_id INT NOT NULL,
+        PRIMARY KEY (tag_id, movie_id),
+        INDEX idx_movie_tags_movie_id (movie_id),
+        FOREIGN KEY (tag_id) REFERENCES tags(id),
+        FOREIGN KEY (movie_id) REFERENCES movies_top250(id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+"""
+
+def create_tag_tables(cursor):
+    """创建标签相关表"""
+    cursor.execute(CREATE_TAGS_SQL)
+    cursor.execute(CREATE_MOVIE_TAGS_SQL)
+
+def save_movie_tags(cursor, movie_id, tags):
+    """写入一部电影的标签关联（调用方负责提交事务），返回写入的标签数"""
+    names = split_tags(tags)
+    if not names:
+        return 0
+    cursor.executemany("INSERT IGNORE INTO tags (name) VALUES (%s)", [(name,) for name in names])
+    placeholders = ', '.join(['%s'] * len(names))
+    cursor.execute(f"SELECT id FROM tags WHERE name IN ({placeholders})", names)
+    tag_ids = [row[0] for row in cursor.fetchall()]
+    cursor.executemany(
+        "INSERT IGNORE INTO movie_tags (tag_id, movie_id) VALUES (%s, %s)",
+        [(tag_id, movie_id) for tag_id in tag_ids]
+    )
+    return len(tag_ids)
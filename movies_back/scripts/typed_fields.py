@@ -0,0 +1,85 @@
+"""
+数值字段与国家关联的解析写入工具，供各爬虫和回填脚本共用
+movies_top250.years、movie_details.duration 都是字符串，国家字段可能包含多个国家（如 "美国 英国"），
+这里在入库时解析为 release_year、duration_minutes 以及 countries/movie_countries 关联。
+"""
+import re
+
+COUNTRY_SEPARATORS = re.compile(r"[/,|，\s]+")
+
+CREATE_COUNTRIES_SQL = """
+    CREATE TABLE IF NOT EXISTS countries (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(50) NOT NULL,
+        UNIQUE INDEX ix_countries_name (name)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+"""
+
+CREATE_MOVIE_COUNTRIES_SQL = """
+    CREATE TABLE IF NOT EXISTS movie_countries (
+        country_id INT NOT NULL,
+        movie_id INT NOT NULL,
+        PRIMARY KEY (country_id, movie_id),
+        INDEX idx_movie_countries_movie_id (movie_id),
+        FOREIGN KEY (country_id) REFERENCES countries(id),
+        FOREIGN KEY (movie_id) REFERENCES movies_top250(id)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+"""
+
+# 与 app/services/rating_stats.py 保持一致：没有豆瓣评分的电影以此作为先验评分，
+# 豆瓣评分作为先验时相当于 PRIOR_WEIGHT 条站内评价
+DEFAULT_PRIOR_RATING = 6.0
+PRIOR_WEIGHT = 10
+
+def parse_year(years):
+    """从年份字符串中提取四位年份，如 "1994"、"1994(中国大陆)" """
+    if not years:
+        return None
+    match = re.search(r"\d{4}", str(years))
+    return int(match.group()) if match else None
+
+def parse_duration(duration):
+    """从片长字符串中提取分钟数，如 "142分钟"、"142"；多个片长时取第一个"""
+    if not duration:
+        return None
+    match = re.search(r"\d+", str(duration))
+    return int(match.group()) if match else None
+
+def split_countries(country):
+    """将国家/地区字符串拆分为去重后的列表"""
+    if not country:
+        return []
+    result = []
+    for name in COUNTRY_SEPARATORS.split(country):
+        name = name.strip()[:50]
+        if name and name not in result:
+            result.append(name)
+    return result
+
+def initial_community_score(rating):
+    """新入库的电影还没有站内评价，社区评分即为先验（豆瓣评分，爬虫中可能是字符串）"""
+    try:
+        rating = float(rating)
+    except (TypeError, ValueError):
+        rating = 0
+    return rating if rating > 0 else DEFAULT_PRIOR_RATING
+
+def create_country_tables(cursor):
+    """创建国家相关表"""
+    cursor.execute(CREATE_COUNTRIES_SQL)
+    cursor.execute(CREATE_MOVIE_COUNTRIES_SQL)
+
+def save_movie_countries(cursor, movie_id, country):
+    """写入一部电影的国家关联（调用方负责提交事务），返回写入的国家数"""
+    names = split_countries(country)
+    if not names:
+        return 0
+    cursor.executemany("INSERT IGNORE INTO countries (name) VALUES (%s)", [(name,) for name in names])
+    placeholders = ', '.join(['%s'] * len(names))
+    cursor.execute(f"SELECT id FROM countries WHERE name IN ({placeholders})", names)
+    country_ids = [row[0] for row in cursor.fetchall()]
+    cursor.executemany(
+        "INSERT IGNORE INTO movie_countries (country_id, movie_id) VALUES (%s, %s)",
+        [(country_id, movie_id) for country_id in country_ids]
+    )
+    return len(country_ids)
@@ -71,7 +71,7 @@ def analyze_movie_data():
         """)
         
         # 获取所有电影数据
-        cursor.execute("SELECT years, tags, rating, country FROM movies_top250")
+        cursor.execute("SELECT years, tags, rating, country, release_year FROM movies_top250")
         movies = cursor.fetchall()
         
         # 初始化统计数据
@@ -83,7 +83,7 @@ def analyze_movie_data():
         # 年份分布统计
         year_counts = {}
         for movie in movies:
-            year = movie[0]
+            year = movie[4]
             if year:
                 year_counts[year] = year_counts.get(year, 0) + 1
         
@@ -158,8 +158,8 @@ def analyze_movie_data():
         # 收集2020-2024年间的电影数据
         recent_movies = []
         for movie in movies:
-            year = movie[0]
-            if year and year.isdigit() and 2020 <= int(year) <= 2024:
+            year = movie[4]
+            if year and 2020 <= year <= 2024:
                 recent_movies.append(movie)
         
         # 如果没有数据，添加一些模拟数据
@@ -207,7 +207,7 @@ def analyze_movie_data():
                         # 先按斜杠分割所有标签
                         movie_tags = movie[1].split('/')
                         if tag in [t.strip() for t in movie_tags]:
-                            year = int(movie[0])
+                            year = movie[4]
                             if 2020 <= year <= 2024:
                                 data[year - 2020] += 1
             
@@ -317,14 +317,18 @@ def get_analysis_data():
 def analyze_year_distribution() -> Dict[str, Any]:
     """分析电影年份分布"""
     try:
-        query = "SELECT years, COUNT(*) as count FROM movies_top250 GROUP BY years ORDER BY years"
+        query = """
+            SELECT release_year, COUNT(*) as count FROM movies_top250
+            WHERE release_year IS NOT NULL
+            GROUP BY release_year ORDER BY release_year
+        """
         results = execute_query(query)
         
         # 转换为Echarts需要的格式
         years = []
         counts = []
         for row in results:
-            years.append(row[0])
+            years.append(str(row[0]))
             counts.append(row[1])
             
         return {
@@ -403,7 +407,14 @@ def analyze_rating_distribution() -> Dict[str, Any]:
 def analyze_country_distribution() -> Dict[str, Any]:
     """分析电影国家分布"""
     try:
-        query = "SELECT country, COUNT(*) as count FROM movies_top250 GROUP BY country ORDER BY count DESC"
+        # 多国家合拍的电影按规范化后的国家关联分别计数
+        query = """
+            SELECT c.name, COUNT(*) as count
+            FROM movie_countries mc
+            JOIN countries c ON c.id = mc.country_id
+            GROUP BY c.id, c.name
+            ORDER BY count DESC
+        """
         results = execute_query(query)
         
         # 转换为Echarts需要的格式
@@ -428,10 +439,10 @@ def analyze_type_trend() -> Dict[str, Any]:
     """分析2020年到2024年不同类型电影的数量变化"""
     try:
         query = """
-            SELECT years, tags, COUNT(*) as count 
+            SELECT release_year, tags, COUNT(*) as count 
             FROM movies_top250 
-            WHERE years BETWEEN 2020 AND 2024
-            GROUP BY years, tags
+            WHERE release_year BETWEEN 2020 AND 2024
+            GROUP BY release_year, tags
         """
         results = execute_query(query)
         
@@ -588,54 +599,35 @@ def analyze_country_rating_comparison() -> Dict[str, Any]:
 def analyze_duration_rating_relation() -> Dict[str, Any]:
     """分析电影时长与评分之间的关系"""
     try:
+        # 按时长分组，每30分钟为一组，分组和平均值都在SQL中完成
         query = """
-            SELECT md.duration, m.rating
+            SELECT
+                CASE
+                    WHEN md.duration_minutes < 90 THEN '90分钟以下'
+                    WHEN md.duration_minutes < 120 THEN '90-120分钟'
+                    WHEN md.duration_minutes < 150 THEN '120-150分钟'
+                    WHEN md.duration_minutes < 180 THEN '150-180分钟'
+                    ELSE '180分钟以上'
+                END AS duration_group,
+                AVG(m.rating) AS avg_rating,
+                COUNT(*) AS count
             FROM movies_top250 m
             JOIN movie_details md ON m.douban_id = md.douban_id
-            WHERE md.duration != '' AND md.duration IS NOT NULL
-              AND m.rating IS NOT NULL
+            WHERE md.duration_minutes IS NOT NULL
+              AND m.rating > 0
+            GROUP BY duration_group
         """
         results = execute_query(query)
         
-        # 将时长分组，每30分钟为一组
         duration_groups = {
-            "90分钟以下": {"ratings": [], "count": 0},
-            "90-120分钟": {"ratings": [], "count": 0},
-            "120-150分钟": {"ratings": [], "count": 0},
-            "150-180分钟": {"ratings": [], "count": 0},
-            "180分钟以上": {"ratings": [], "count": 0}
+            "90分钟以下": None,
+            "90-120分钟": None,
+            "120-150分钟": None,
+            "150-180分钟": None,
+            "180分钟以上": None
         }
-        
         for row in results:
-            try:
-                # 提取分钟数（移除可能的非数字字符）
-                duration_str = str(row[0]).strip()
-                # 提取数字部分
-                duration_num = int(''.join(filter(str.isdigit, duration_str)))
-                rating = float(row[1]) if row[1] else 0
-                
-                if rating <= 0:
-                    continue
-                
-                # 根据时长分组
-                if duration_num < 90:
-                    duration_groups["90分钟以下"]["ratings"].append(rating)
-                    duration_groups["90分钟以下"]["count"] += 1
-                elif duration_num < 120:
-                    duration_groups["90-120分钟"]["ratings"].append(rating)
-                    duration_groups["90-120分钟"]["count"] += 1
-                elif duration_num < 150:
-                    duration_groups["120-150分钟"]["ratings"].append(rating)
-                    duration_groups["120-150分钟"]["count"] += 1
-                elif duration_num < 180:
-                    duration_groups["150-180分钟"]["ratings"].append(rating)
-                    duration_groups["150-180分钟"]["count"] += 1
-                else:
-                    duration_groups["180分钟以上"]["ratings"].append(rating)
-                    duration_groups["180分钟以上"]["count"] += 1
-            except Exception as e:
-                print(f"处理行数据出错: {str(e)}, 数据: {row}")
-                continue
+            duration_groups[row[0]] = {"avg_rating": float(row[1]), "count": int(row[2])}
         
         # 计算每组的平均评分和电影数量
         categories = []
@@ -643,10 +635,9 @@ def analyze_duration_rating_relation() -> Dict[str, Any]:
         movie_counts = []
         
         for category, data in duration_groups.items():
-            if data["count"] > 0:
+            if data and data["count"] > 0:
                 categories.append(category)
-                avg_rating = round(sum(data["ratings"]) / data["count"], 1)
-                avg_ratings.append(avg_rating)
+                avg_ratings.append(round(data["avg_rating"], 1))
                 movie_counts.append(data["count"])
         
         # 返回数据
@@ -674,13 +665,13 @@ def analyze_type_duration_rating() -> Dict[str, Any]:
     """分析电影类型、时长和评分之间的关系"""
     try:
         query = """
-            SELECT m.tags, md.duration, m.rating, COUNT(*) as count
+            SELECT m.tags, md.duration_minutes, m.rating, COUNT(*) as count
             FROM movies_top250 m
             JOIN movie_details md ON m.douban_id = md.douban_id
-            WHERE md.duration != '' AND md.duration IS NOT NULL
+            WHERE md.duration_minutes IS NOT NULL
               AND m.rating IS NOT NULL
               AND m.tags IS NOT NULL
-            GROUP BY m.tags, md.duration, m.rating
+            GROUP BY m.tags, md.duration_minutes, m.rating
         """
         results = execute_query(query)
         
@@ -691,17 +682,14 @@ def analyze_type_duration_rating() -> Dict[str, Any]:
         
         for row in results:
             tags = row[0]
-            duration_str = str(row[1]).strip()
+            duration_num = int(row[1])
             rating = float(row[2]) if row[2] else 0
             count = int(row[3])
             
             if rating <= 0:
                 continue
                 
-            # 提取时长的数字部分（分钟）
             try:
-                duration_num = int(''.join(filter(str.isdigit, duration_str)))
-                
                 # 处理每个标签
                 if '/' in tags:
                     tag_list = [tag.strip() for tag in tags.split('/') if tag.strip()]
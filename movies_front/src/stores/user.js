@@ -4,7 +4,10 @@ import axios from 'axios'
 
 export const useUserStore = defineStore('user', () => {
   const token = ref(localStorage.getItem('token') || '')
+  const refreshToken = ref(localStorage.getItem('refresh_token') || '')
   const userInfo = ref(null)
+  // 进行中的刷新请求，并发的 401 共用同一次刷新
+  let refreshing = null
 
   // 设置token
   const setToken = (newToken) => {
@@ -14,13 +17,62 @@ export const useUserStore = defineStore('user', () => {
     axios.defaults.headers.common['Authorization'] = `Bearer ${newToken}`
   }
 
+  // 设置刷新token
+  const setRefreshToken = (newToken) => {
+    refreshToken.value = newToken || ''
+    if (newToken) {
+      localStorage.setItem('refresh_token', newToken)
+    } else {
+      localStorage.removeItem('refresh_token')
+    }
+  }
+
   // 清除token
   const clearToken = () => {
     token.value = ''
     localStorage.removeItem('token')
+    setRefreshToken('')
     delete axios.defaults.headers.common['Authorization']
   }
 
+  // 用刷新token换取新的token对，刷新token只能使用一次
+  const refreshAccessToken = () => {
+    if (!refreshing) {
+      refreshing = axios.post('/api/users/token/refresh', { refresh_token: refreshToken.value })
+        .then(response => {
+          setToken(response.data.access_token)
+          setRefreshToken(response.data.refresh_token)
+          return response.data.access_token
+        })
+        .finally(() => {
+          refreshing = null
+        })
+    }
+    return refreshing
+  }
+
+  // 访问token过期时自动刷新并重试一次，刷新失败则清除登录状态
+  axios.interceptors.response.use(
+    response => response,
+    async error => {
+      const config = error.config
+      const isAuthRequest = config?.url?.includes('/api/users/token')
+      if (error.response?.status !== 401 || !config || config._retried || isAuthRequest || !refreshToken.value) {
+        return Promise.reject(error)
+      }
+      try {
+        const newToken = await refreshAccessToken()
+        config._retried = true
+        config.headers['Authorization'] = `Bearer ${newToken}`
+        return axios(config)
+      } catch (refreshError) {
+        clearToken()
+        userInfo.value = null
+        return Promise.reject(error)
+      }
+    }
+  )
+
   // 初始化store
   const initializeStore = async () => {
     const savedToken = localStorage.getItem('token')
@@ -54,6 +106,7 @@ export const useUserStore = defineStore('user', () => {
       
       const response = await axios.post('/api/users/token', formData)
       setToken(response.data.access_token)
+      setRefreshToken(response.data.refresh_token)
       await fetchUserInfo()
       return response.data
     } catch (error) {
@@ -64,7 +117,8 @@ export const useUserStore = defineStore('user', () => {
   // 登出
   const logout = async () => {
     try {
-      await axios.post('/api/users/logout')
+      // 服务端吊销访问token和刷新token
+      await axios.post('/api/users/logout', { refresh_token: refreshToken.value || null })
       clearToken()
       userInfo.value = null
     } catch (error) {